@@ -1,20 +1,50 @@
 from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
 import os
 import sys
 import logging
 import json
+import re
+import codecs
+import base64
+import threading
+import atexit
+import functools
+import mmap
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlsplit
 from typing import List, Dict, Any
 from shapely.geometry import shape as shapely_shape, mapping as shapely_mapping
 from shapely.geometry.base import BaseGeometry
+from shapely import wkb as shapely_wkb
+import shapely
+from shapely import make_valid
+import numpy as np
 from shapely.geometry import Polygon as ShpPolygon, MultiPolygon as ShpMultiPolygon, Point as ShpPoint
 from shapely.ops import unary_union
+from shapely.strtree import STRtree
+
+# Prefer orjson for (de)serialization when available; fall back to stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Advisory file locks are only available on POSIX; elsewhere a thread lock has to do
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# KEY=value lines of a .env file; blank lines and # comments do not match
+_ENV_LINE_RE = re.compile(r'^[ \t]*([^\s#=][^=\n]*)=(.*)$', re.MULTILINE)
+
 # Custom dotenv loader with better error handling
 def safe_load_dotenv():
     env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -28,39 +58,30 @@ def safe_load_dotenv():
         except ImportError:
             logger.info("python-dotenv not installed, using manual method")
             
-        # Manual fallback - read .env file directly
-        if os.path.exists(env_path):
+        # Manual fallback - read .env file once, then parse it a single time
+        try:
+            with open(env_path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = None
+        if raw is not None:
+            # A BOM identifies UTF-16 files (as written by some Windows editors);
+            # otherwise try UTF-8 and fall back to latin1, which decodes anything
+            if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+                encoding = 'utf-16'
+            elif raw.startswith(codecs.BOM_UTF8):
+                encoding = 'utf-8-sig'
+            else:
+                encoding = 'utf-8'
             try:
-                # Try UTF-8 first
-                with open(env_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line or line.startswith('#'):
-                            continue
-                        if '=' in line:
-                            key, value = line.split('=', 1)
-                            os.environ[key.strip()] = value.strip()
-                logger.info("Manually loaded environment from .env using UTF-8")
-                return True
+                text = raw.decode(encoding)
             except UnicodeDecodeError:
-                # Try other encodings
-                for encoding in ['latin1', 'utf-16', 'utf-16-le', 'utf-16-be']:
-                    try:
-                        with open(env_path, 'r', encoding=encoding) as f:
-                            for line in f:
-                                line = line.strip()
-                                if not line or line.startswith('#'):
-                                    continue
-                                if '=' in line:
-                                    key, value = line.split('=', 1)
-                                    os.environ[key.strip()] = value.strip()
-                        logger.info(f"Manually loaded environment from .env using {encoding}")
-                        return True
-                    except:
-                        continue
-                
-                # If all encodings fail, manually set environment variables
-                logger.warning("Failed to read .env file with various encodings. Setting defaults.")
+                encoding = 'latin1'
+                text = raw.decode(encoding)
+
+            os.environ.update({key.strip(): value.strip() for key, value in _ENV_LINE_RE.findall(text)})
+            logger.info(f"Manually loaded environment from .env using {encoding}")
+            return True
     except Exception as e:
         logger.error(f"Error loading environment variables: {str(e)}")
     
@@ -74,7 +95,85 @@ def safe_load_dotenv():
 # Load environment variables
 safe_load_dotenv()
 
+
+def _json_dumps(obj) -> bytes:
+    """Serialize to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _json_loads(data):
+    """Parse JSON with orjson when it is installed, else (or if orjson rejects it) stdlib json.
+
+    The stdlib parser also accepts the NaN/Infinity tokens that files written by
+    json.dump may hold, which orjson refuses.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+# Files at least this large are parsed from a read-only mapping instead of a copy
+_MMAP_MIN_BYTES = 1 << 20
+
+
+def _load_json_file(f, size: int):
+    """Parse the JSON in the open binary file ``f`` of ``size`` bytes.
+
+    With orjson, large files are parsed straight from the page cache through
+    mmap, skipping the intermediate bytes copy of ``f.read()``.
+    """
+    if orjson is None or size < _MMAP_MIN_BYTES:
+        return _json_loads(f.read())
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        with memoryview(buf) as view:
+            try:
+                return orjson.loads(view)
+            except orjson.JSONDecodeError:
+                pass
+        return json.loads(buf[:])
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that routes jsonify() and request.get_json() through
+    orjson when available."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes to the response as they are, instead of decoding them
+        # in dumps() for Flask to encode again
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(
+                obj,
+                default=self.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+            ),
+            mimetype=self.mimetype
+        )
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Configure CORS: allow only the configured frontend origin
 def _extract_origin(url_value: str | None) -> str | None:
@@ -89,7 +188,9 @@ def _extract_origin(url_value: str | None) -> str | None:
     except Exception:
         return url_value.rstrip('/')
 
-frontend_origin = _extract_origin(os.getenv('FRONTEND_URL'))
+# Read once: the CORS setup and the health payload both derive from it
+FRONTEND_URL = os.getenv('FRONTEND_URL')
+frontend_origin = _extract_origin(FRONTEND_URL)
 logger.info(f"Frontend origin set to: {frontend_origin}")
 
 if frontend_origin:
@@ -99,29 +200,57 @@ else:
     cors_origins = "*"
     logger.warning("No FRONTEND_URL found, CORS set to allow any origin")
 
-CORS(app, resources={
-    r"/api/*": {
-        "origins": cors_origins,
-        "methods": ["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+# Only one origin (or any) is ever allowed, so the CORS headers are fixed at
+# startup and copied onto /api/ responses as they are
+_CORS_HEADERS = {"Access-Control-Allow-Origin": cors_origins}
+if cors_origins != "*":
+    _CORS_HEADERS["Vary"] = "Origin"
+_CORS_PREFLIGHT_HEADERS = {
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, PATCH, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+}
+
+
+@app.after_request
+def _add_cors_headers(response):
+    # Preflights are answered by Flask's automatic OPTIONS handling of each route
+    if request.path.startswith('/api/'):
+        response.headers.update(_CORS_HEADERS)
+        if request.method == 'OPTIONS':
+            response.headers.update(_CORS_PREFLIGHT_HEADERS)
+    return response
+
+
+# The health payload only depends on startup configuration, so serialize it once
+_HEALTH_BYTES = _json_dumps({
+    "status": "healthy",
+    "env": {
+        "frontend_url": FRONTEND_URL,
+        "cors_origin": cors_origins
     }
 })
 
 
+def _json_body() -> Any:
+    """Parse the request body as JSON, whatever its Content-Type; {} when empty.
+
+    Reads the raw body once without caching it and parses it with _json_loads.
+    Invalid JSON raises ValueError for the handler to report.
+    """
+    data = request.get_data(cache=False)
+    if not data:
+        return {}
+    return _json_loads(data)
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({
-        "status": "healthy",
-        "env": {
-            "frontend_url": os.getenv('FRONTEND_URL'),
-            "cors_origin": cors_origins
-        }
-    })
+    return app.response_class(_HEALTH_BYTES, mimetype='application/json')
 
 @app.route('/api/init-data', methods=['POST'])
 def init_data():
     try:
-        data = request.json
+        data = _json_body()
         if not data:
             return jsonify({"status": "error", "message": "No data provided"}), 400
 
@@ -144,82 +273,603 @@ PATHS_FILE = os.path.join(DATA_DIR, 'paths.json')
 def _ensure_data_file():
     os.makedirs(DATA_DIR, exist_ok=True)
     if not os.path.exists(REFUGES_FILE):
-        with open(REFUGES_FILE, 'w', encoding='utf-8') as f:
-            json.dump({"refuges": []}, f)
+        with open(REFUGES_FILE, 'wb') as f:
+            f.write(_json_dumps({"refuges": []}))
     if not os.path.exists(PATHS_FILE):
-        with open(PATHS_FILE, 'w', encoding='utf-8') as f:
-            json.dump({"paths": []}, f)
+        with open(PATHS_FILE, 'wb') as f:
+            f.write(_json_dumps({"paths": []}))
+
+# Refuge changes are journaled: each write appends its changed/removed records to
+# REFUGES_WAL as one JSON op per line and fsyncs only that tail. A background timer
+# folds the journal back into REFUGES_FILE (tmp-file + os.replace) and removes it.
+# Readers always see snapshot + journal, so nothing is lost if the process dies
+# before compaction; replaying ops is idempotent, so neither is a crash mid-way.
+REFUGES_WAL = os.path.join(DATA_DIR, 'refuges.wal')
+REFUGES_LOCK_FILE = os.path.join(DATA_DIR, 'refuges.lock')
+REFUGES_COMPACT_INTERVAL = float(os.getenv('REFUGES_COMPACT_INTERVAL', '5'))
+# Set DATA_FSYNC=0 to skip the fsync of refuge journal appends and path writes on
+# the request path; a crash may then lose the last few writes. os.replace still
+# keeps paths.json whole, and refuge compaction always syncs.
+DATA_FSYNC = os.getenv('DATA_FSYNC', '1') != '0'
+# Compact as soon as this many ops have been journaled by this process
+REFUGES_COMPACT_EVERY = int(os.getenv('REFUGES_COMPACT_EVERY', '100'))
+
+# Parsed refuges are cached in-process and keyed by the identity (inode, mtime,
+# size) of both the snapshot and the journal, so any change on disk - including
+# one made by another worker process - produces a new key. Data derived from a
+# snapshot (name and id maps, the geometry index, ...) is stored on its cache dict.
+# Callers get a shallow copy of the list; records are copy-on-write, see _apply_refuge_ops.
+_refuges_cache: Dict[str, Any] = {"key": None, "list": None, "response_bytes": None}
+
+# Serializes journal appends and compaction: a thread lock within the process,
+# plus flock on REFUGES_LOCK_FILE across gunicorn workers where available
+_refuges_lock = threading.RLock()
+_refuges_lock_depth = 0
+_compaction = {"timer": None, "pid": None, "ops": 0}
+
+
+def _file_key(st: os.stat_result) -> tuple:
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _stat_key(path: str):
+    try:
+        return _file_key(os.stat(path))
+    except FileNotFoundError:
+        return None
 
-def _read_refuges() -> List[Dict[str, Any]]:
-    _ensure_data_file()
+
+@contextmanager
+def _refuges_store_lock():
+    global _refuges_lock_depth
+    with _refuges_lock:
+        if fcntl is None or _refuges_lock_depth:
+            _refuges_lock_depth += 1
+            try:
+                yield
+            finally:
+                _refuges_lock_depth -= 1
+            return
+        fd = os.open(REFUGES_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            _refuges_lock_depth += 1
+            try:
+                yield
+            finally:
+                _refuges_lock_depth -= 1
+        finally:
+            os.close(fd)
+
+
+def _apply_refuge_ops(refuges: List[Dict[str, Any]], ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return a new list with journal ops applied.
+
+    "put" replaces the record with the same id, or appends it; "del" removes the
+    record with the given id if present.
+
+    Records are copy-on-write: a change always swaps in a new dict and never
+    mutates a cached one. A record that is the very same object as before is
+    therefore unchanged, which the journal diff, the geometry index and the
+    JSON fragments all rely on to skip re-comparing, re-parsing or
+    re-serializing it.
+    """
+    result = list(refuges)
+    pos = {r.get('id'): i for i, r in enumerate(result) if isinstance(r, dict) and r.get('id') is not None}
+    removed = False
+    for op in ops:
+        kind = op.get('op')
+        if kind == 'put':
+            rec = op.get('refuge')
+            if not isinstance(rec, dict):
+                continue
+            i = pos.get(rec.get('id'))
+            if i is None:
+                pos[rec.get('id')] = len(result)
+                result.append(rec)
+            else:
+                result[i] = rec
+        elif kind == 'del':
+            i = pos.pop(op.get('id'), None)
+            if i is not None:
+                result[i] = None
+                removed = True
+    if removed:
+        result = [r for r in result if r is not None]
+    return result
+
+
+def _diff_refuges(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return the journal ops turning `old` into `new`, skipping records kept by identity."""
+    old_by_id = {r.get('id'): r for r in old if isinstance(r, dict) and r.get('id') is not None}
+    ops = []
+    seen = set()
+    for r in new:
+        if not isinstance(r, dict) or r.get('id') is None:
+            continue
+        rid = r['id']
+        seen.add(rid)
+        prev = old_by_id.get(rid)
+        if prev is r or prev == r:
+            continue
+        ops.append({"op": "put", "refuge": r})
+    for rid in old_by_id:
+        if rid not in seen:
+            ops.append({"op": "del", "id": rid})
+    return ops
+
+
+def _read_refuge_ops(data: bytes) -> List[Dict[str, Any]]:
+    ops = []
+    lines = data.split(b'\n')
+    # Anything after the last newline is an append still in progress
+    for line in lines[:-1]:
+        if not line.strip():
+            continue
+        try:
+            op = _json_loads(line)
+        except Exception as e:
+            logger.error(f"Skipping unreadable refuges journal entry: {e}")
+            continue
+        if isinstance(op, dict):
+            ops.append(op)
+    return ops
+
+
+def _tail_refuges_journal(cache: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Return ``cache`` advanced by the ops appended to the journal since it was read.
+
+    Only the bytes past the cache's ``wal_offset`` are read and parsed. Returns
+    None when the journal is not the file the cache was built from, so the
+    caller reloads everything.
+    """
+    cached_wal = cache["key"][1]
+    offset = cache.get("wal_offset") if cached_wal is not None else 0
+    if offset is None:
+        return None
+    try:
+        with open(REFUGES_WAL, 'rb') as f:
+            wal_key = _file_key(os.fstat(f.fileno()))
+            if cached_wal is not None and (wal_key[0] != cached_wal[0] or wal_key[2] < offset):
+                return None
+            # The byte before the offset ends the last op read; anything else means
+            # the journal was recreated (e.g. with a reused inode)
+            f.seek(offset - 1 if offset else 0)
+            tail = f.read()
+            if offset:
+                if tail[:1] != b'\n':
+                    return None
+                tail = tail[1:]
+    except FileNotFoundError:
+        return None
+    # A compaction since the caller's check may have folded ops the cache lacks
+    # into a new snapshot, and started a new journal
+    if _stat_key(REFUGES_FILE) != cache["key"][0]:
+        return None
+    ops = _read_refuge_ops(tail)
+    key = (cache["key"][0], wal_key)
+    wal_offset = offset + tail.rfind(b'\n') + 1
+    if not ops:
+        # Nothing complete was appended, so the derived caches stay valid
+        return dict(cache, key=key, wal_offset=wal_offset)
+    return {
+        "key": key,
+        "list": _apply_refuge_ops(cache["list"], ops),
+        "response_bytes": None,
+        "wal_offset": wal_offset,
+    }
+
+
+def _refuges_snapshot() -> Dict[str, Any]:
+    """Return the current refuges cache entry, reloading it if the files changed.
+
+    When only the journal grew (another worker saved), just the new ops are read.
+    """
+    global _refuges_cache
+    cache = _refuges_cache
     try:
-        with open(REFUGES_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            refuges = data.get('refuges', [])
-            if isinstance(refuges, list):
-                return refuges
-            return []
+        if cache["list"] is not None and cache["key"] is not None and cache["key"][0] == _stat_key(REFUGES_FILE):
+            if cache["key"][1] == _stat_key(REFUGES_WAL):
+                return cache
+            tailed = _tail_refuges_journal(cache)
+            if tailed is not None:
+                _refuges_cache = tailed
+                return tailed
+        for _attempt in range(3):
+            try:
+                with open(REFUGES_FILE, 'rb') as f:
+                    snapshot_key = _file_key(os.fstat(f.fileno()))
+                    data = _load_json_file(f, snapshot_key[2])
+            except FileNotFoundError:
+                # Not written yet (or removed at runtime): an empty store
+                snapshot_key, data = None, {}
+            try:
+                with open(REFUGES_WAL, 'rb') as f:
+                    wal_key = _file_key(os.fstat(f.fileno()))
+                    wal_data = f.read()
+            except FileNotFoundError:
+                wal_key, wal_data = None, b''
+            # A compaction between the two reads folds the journal into a newer
+            # snapshot, so this journal does not belong to the snapshot read
+            if _stat_key(REFUGES_FILE) == snapshot_key:
+                break
+        refuges = data.get('refuges', []) if isinstance(data, dict) else []
+        if not isinstance(refuges, list):
+            refuges = []
+        ops = _read_refuge_ops(wal_data)
+        if ops:
+            refuges = _apply_refuge_ops(refuges, ops)
+        key = (snapshot_key, wal_key) if snapshot_key is not None or wal_key is not None else None
+        cache = {
+            "key": key,
+            "list": refuges,
+            "response_bytes": None,
+            "wal_offset": wal_data.rfind(b'\n') + 1,
+        }
+        if key is not None:
+            _refuges_cache = cache
+        return cache
     except Exception as e:
         logger.error(f"Failed to read refuges: {e}")
-        return []
+        # Readers get an empty list; writers must not journal changes on top of it
+        return {"key": None, "list": [], "response_bytes": None, "failed": True}
+
+
+def _read_refuges() -> List[Dict[str, Any]]:
+    return list(_refuges_snapshot()["list"])
+
+
+def _refuge_names_lower(cache: Dict[str, Any]) -> Counter:
+    """Return how many refuges use each stripped, lowercased name; copy before modifying."""
+    names = cache.get("names_lower")
+    if names is None:
+        names = Counter(r['name'].strip().lower() for r in cache["list"] if isinstance(r.get('name'), str))
+        if cache.get("key") is not None:
+            cache["names_lower"] = names
+    return names
+
+def _refuge_name_index(cache: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Return a stripped, lowercased name -> refuge map for a cache snapshot."""
+    name_index = cache.get("name_index")
+    if name_index is None:
+        name_index = {r.get('name').strip().lower(): r for r in cache["list"] if isinstance(r.get('name'), str)}
+        if cache.get("key") is not None:
+            cache["name_index"] = name_index
+    return name_index
+
+def _refuge_position(cache: Dict[str, Any], refuge_id: int) -> int | None:
+    """Return the list position of the refuge with integer id ``refuge_id`` in a cache snapshot."""
+    positions = cache.get("positions")
+    if positions is None:
+        positions = {}
+        for i, r in enumerate(cache["list"]):
+            rid = r.get('id') if isinstance(r, dict) else None
+            if isinstance(rid, int):
+                positions.setdefault(rid, i)
+        if cache.get("key") is not None:
+            cache["positions"] = positions
+    return positions.get(refuge_id)
+
+def _refuge_labels(cache: Dict[str, Any]) -> tuple:
+    """Return the (id, name) pairs of a cache snapshot, the only refuge fields paths are grouped by."""
+    labels = cache.get("labels")
+    if labels is None:
+        labels = tuple((r.get('id'), r.get('name')) for r in cache["list"])
+        if cache.get("key") is not None:
+            cache["labels"] = labels
+    return labels
+
 
 def _write_refuges(refuges: List[Dict[str, Any]]):
-    """Write refuges atomically to avoid corruption across restarts.
-    Writes to a temporary file in the same directory and then replaces.
+    """Persist refuges by journaling the records that changed.
+
+    Only the appended ops are fsynced (unless DATA_FSYNC=0); the full snapshot
+    is rewritten later by _compact_refuges. On success the in-process cache is
+    updated so the next read skips the disk; on failure the error is raised, so
+    the handler does not report a change that was not saved.
     """
-    _ensure_data_file()
-    tmp_path = REFUGES_FILE + '.tmp'
+    global _refuges_cache
     try:
-        with open(tmp_path, 'w', encoding='utf-8') as f:
-            json.dump({"refuges": refuges}, f)
-            f.flush()
-            os.fsync(f.fileno())
-        os.replace(tmp_path, REFUGES_FILE)
+        with _refuges_store_lock():
+            current = _refuges_snapshot()
+            if current.get("failed"):
+                raise RuntimeError("the stored refuges could not be read")
+            ops = _diff_refuges(current["list"], refuges)
+            if not ops:
+                return
+            # Raw O_APPEND writes of the joined ops, bypassing Python's buffered
+            # writer, so the ops land together at the end of the journal
+            fd = os.open(REFUGES_WAL, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o666)
+            try:
+                payload = b''.join(_json_dumps(op) + b'\n' for op in ops)
+                # An append torn by a crash is terminated first, so it stays a line of
+                # its own that replay skips instead of swallowing the first new op
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b'\n':
+                    payload = b'\n' + payload
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(fd, view):]
+                if DATA_FSYNC:
+                    os.fsync(fd)
+                wal_key = _file_key(os.fstat(fd))
+            finally:
+                os.close(fd)
+            _compaction["ops"] += len(ops)
+            snapshot_key = current["key"][0] if current["key"] is not None else None
+            _refuges_cache = {
+                "key": (snapshot_key, wal_key),
+                "list": _apply_refuge_ops(current["list"], ops),
+                "response_bytes": None,
+                "wal_offset": wal_key[2],
+            }
     except Exception as e:
         logger.error(f"Failed to write refuges: {e}")
+        raise
+    _schedule_refuges_compaction()
+
+
+def _with_stored_wkb(cache: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the snapshot's records with a WKB copy added to legacy GeoJSON-only ones.
+
+    Written out on compaction, so later loads skip re-parsing and repairing them.
+    """
+    records = cache["list"]
+    legacy = [i for i, r in enumerate(records) if 'wkb_b64' not in r and r.get('polygon')]
+    if not legacy:
+        return records
+    index = cache.get("index")
+    if index is not None:
+        by_record = {id(r): g for r, g in zip(index["refuges"], index["geoms"])}
+        geoms = [by_record.get(id(records[i])) for i in legacy]
+    else:
+        geoms = _load_refuge_geometries([records[i] for i in legacy])
+    out = list(records)
+    for i, geom in zip(legacy, geoms):
+        if geom is None or geom.is_empty:
+            continue
+        out[i] = dict(records[i], wkb_b64=base64.b64encode(shapely_wkb.dumps(geom)).decode('ascii'))
+    return out
+
+
+def _replace_file(path: str, payload: bytes, fsync: bool = True):
+    """Atomically replace ``path`` with ``payload`` and return the new file's key.
+
+    The payload is written with raw os.write calls to a temp file named after
+    this process and thread, so writers in other workers never share one, and
+    then swapped in with os.replace.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
         try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            if fsync:
+                os.fsync(fd)
+            # os.replace keeps inode and mtime, so this matches the final file
+            key = _file_key(os.fstat(fd))
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
             pass
+        raise
+    return key
+
+
+def _compact_refuges():
+    """Fold the journal into the refuges snapshot atomically, then drop the journal."""
+    global _refuges_cache
+    if not os.path.exists(REFUGES_WAL):
+        return
+    try:
+        with _refuges_store_lock():
+            cache = _refuges_snapshot()
+            if cache["key"] is None or cache["key"][1] is None:
+                return
+            snapshot_key = _replace_file(REFUGES_FILE, _json_dumps({"refuges": _with_stored_wkb(cache)}))
+            os.remove(REFUGES_WAL)
+            _compaction["ops"] = 0
+            # Same records, so the derived caches (index, names, response) stay valid
+            _refuges_cache = dict(cache, key=(snapshot_key, None))
+    except Exception as e:
+        logger.error(f"Failed to compact refuges: {e}")
+
+
+def _run_refuges_compaction():
+    with _refuges_lock:
+        _compaction["timer"] = None
+    _compact_refuges()
+
+
+def _schedule_refuges_compaction():
+    """Arm a one-shot timer for compaction unless one is already pending in this process.
+
+    Once REFUGES_COMPACT_EVERY ops are journaled the compaction starts right away.
+    """
+    with _refuges_lock:
+        timer = _compaction["timer"]
+        due = _compaction["ops"] >= REFUGES_COMPACT_EVERY
+        # Timers do not survive fork, so one armed in a parent process does not count
+        if timer is not None and _compaction["pid"] == os.getpid() and timer.is_alive():
+            if not due:
+                return
+            timer.cancel()
+        timer = threading.Timer(0 if due else REFUGES_COMPACT_INTERVAL, _run_refuges_compaction)
+        timer.daemon = True
+        _compaction["timer"] = timer
+        _compaction["pid"] = os.getpid()
+        timer.start()
+
+
+# Fold any journaled writes into the snapshot on clean shutdown
+atexit.register(_compact_refuges)
+
+
+def _refuges_transaction(view):
+    """Run a mutating refuge route under the store lock.
+
+    The read-modify-write of a handler is then atomic with respect to other
+    threads and worker processes, so two concurrent creates cannot pick the
+    same id or overwrite each other's changes.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with _refuges_store_lock():
+            return view(*args, **kwargs)
+    return wrapper
 
 
 # -----------------------------
 # Path persistence utilities
 # -----------------------------
-def _read_paths() -> List[Dict[str, Any]]:
-    _ensure_data_file()
+# Parsed paths are cached the same way as refuges: keyed by the file's identity
+# (inode, mtime, size) and replaced wholesale on write. Callers get a shallow copy
+# of the list and must replace a path dict with an updated copy, never mutate it.
+_paths_cache: Dict[str, Any] = {"key": None, "list": None}
+
+
+def _paths_snapshot() -> Dict[str, Any]:
+    """Return the current paths cache entry, reloading it if the file changed."""
+    global _paths_cache
+    cache = _paths_cache
     try:
-        with open(PATHS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            paths = data.get('paths', [])
-            if isinstance(paths, list):
-                return paths
-            return []
+        if cache["list"] is not None and cache["key"] == _file_key(os.stat(PATHS_FILE)):
+            return cache
+        with open(PATHS_FILE, 'rb') as f:
+            key = _file_key(os.fstat(f.fileno()))
+            data = _load_json_file(f, key[2])
+        paths = data.get('paths', []) if isinstance(data, dict) else []
+        if not isinstance(paths, list):
+            paths = []
+        cache = {"key": key, "list": paths}
+        _paths_cache = cache
+        return cache
+    except FileNotFoundError:
+        return {"key": None, "list": []}
     except Exception as e:
         logger.error(f"Failed to read paths: {e}")
-        return []
+        # Readers get an empty list; writers must not save over the stored paths with it
+        return {"key": None, "list": [], "failed": True}
+
+
+def _read_paths() -> List[Dict[str, Any]]:
+    return list(_paths_snapshot()["list"])
+
+
+def _path_positions(cache: Dict[str, Any]) -> Dict[int, int]:
+    """Return the path id -> list position map of a paths snapshot."""
+    positions = cache.get("positions")
+    if positions is None:
+        positions = {}
+        for i, p in enumerate(cache["list"]):
+            try:
+                positions.setdefault(int(p.get('id', 0) or 0), i)
+            except (AttributeError, TypeError, ValueError):
+                continue
+        if cache.get("key") is not None:
+            cache["positions"] = positions
+    return positions
+
+
+def _path_position(cache: Dict[str, Any], path_id: int) -> int | None:
+    """Return the list position of the path with id ``path_id`` in a paths snapshot."""
+    return _path_positions(cache).get(path_id)
+
+
+def _point_coord(pt: Any, field: str) -> float:
+    try:
+        return float(pt.get(field))
+    except (AttributeError, TypeError, ValueError):
+        return np.nan
+
+
+def _path_point_coords(path_id: int, points: List[Any]) -> np.ndarray:
+    """Return an (N, 2) float64 array of a path's point lat/lng, NaN where unusable.
+
+    Kept per paths snapshot while the path still holds the same points list.
+    """
+    cache = _paths_snapshot()
+    coords_by_path = cache.setdefault("coords", {}) if cache["key"] is not None else {}
+    cached = coords_by_path.get(path_id)
+    if cached is not None and cached[0] is points:
+        return cached[1]
+    coords = np.empty((len(points), 2), dtype=np.float64)
+    coords[:, 0] = np.fromiter((_point_coord(pt, 'lat') for pt in points), dtype=np.float64, count=len(points))
+    coords[:, 1] = np.fromiter((_point_coord(pt, 'lng') for pt in points), dtype=np.float64, count=len(points))
+    coords_by_path[path_id] = (points, coords)
+    return coords
 
 
 def _write_paths(paths: List[Dict[str, Any]]):
     """Write paths atomically to avoid corruption."""
-    _ensure_data_file()
-    tmp_path = PATHS_FILE + '.tmp'
+    global _paths_cache
     try:
-        with open(tmp_path, 'w', encoding='utf-8') as f:
-            json.dump({"paths": paths}, f)
-            f.flush()
-            os.fsync(f.fileno())
-        os.replace(tmp_path, PATHS_FILE)
+        key = _replace_file(PATHS_FILE, _json_dumps({"paths": paths}), fsync=DATA_FSYNC)
+        _paths_cache = {"key": key, "list": list(paths)}
     except Exception as e:
         logger.error(f"Failed to write paths: {e}")
-        try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception:
-            pass
 
 
+# Optional write-behind for paths: with PATHS_WRITE_DELAY_MS > 0 a save only
+# updates the cache and schedules a write, so a burst of popup/path edits is
+# written once. Unflushed edits are not visible to other worker processes and are
+# lost on a crash, so only enable it for single-worker deployments.
+PATHS_WRITE_DELAY = float(os.getenv('PATHS_WRITE_DELAY_MS', '0')) / 1000.0
+_paths_lock = threading.Lock()
+_paths_pending: Dict[str, Any] = {"paths": None, "timer": None, "pid": None}
+
+
+def _flush_paths():
+    """Write any pending paths now."""
+    with _paths_lock:
+        pending = _paths_pending["paths"]
+        _paths_pending["paths"] = None
+        _paths_pending["timer"] = None
+        if pending is not None:
+            _write_paths(pending)
+
+
+def _save_paths(paths: List[Dict[str, Any]]):
+    """Persist paths, immediately or (with PATHS_WRITE_DELAY_MS) coalesced with later saves.
+
+    Raises instead of saving while paths.json cannot be read, since ``paths``
+    was then built from an empty list.
+    """
+    global _paths_cache
+    if _paths_snapshot().get("failed"):
+        raise RuntimeError("the stored paths could not be read")
+    if PATHS_WRITE_DELAY <= 0:
+        _write_paths(paths)
+        return
+    with _paths_lock:
+        # Keyed to the file as it is on disk now, so reads keep seeing the
+        # in-memory list until the flush (or another process) changes the file.
+        # Without a file there is no key to hold it to, so write it right away.
+        key = _stat_key(PATHS_FILE)
+        if key is None:
+            _paths_pending["paths"] = None
+            _write_paths(paths)
+            return
+        _paths_cache = {"key": key, "list": list(paths)}
+        _paths_pending["paths"] = list(paths)
+        timer = _paths_pending["timer"]
+        if timer is not None and _paths_pending["pid"] == os.getpid() and timer.is_alive():
+            return
+        timer = threading.Timer(PATHS_WRITE_DELAY, _flush_paths)
+        timer.daemon = True
+        _paths_pending["timer"] = timer
+        _paths_pending["pid"] = os.getpid()
+        timer.start()
+
+
+atexit.register(_flush_paths)
+
 def _coerce_float(val):
     try:
         return float(val)
@@ -239,34 +889,37 @@ def _find_refuge_containing_point(lat: float | None, lng: float | None):
     except Exception:
         return None
 
-    refuges = _read_refuges()
-    for refuge in refuges:
-        poly = refuge.get('polygon')
-        if not poly or not isinstance(poly, dict):
-            continue
-        try:
-            geom = _make_valid_polygonal(shapely_shape(poly))
-        except Exception:
-            continue
-        try:
-            if geom.is_empty:
-                continue
-            if geom.covers(pt) or geom.contains(pt):
-                return refuge
-        except Exception:
-            try:
-                buffered = geom.buffer(0)
-                if buffered.covers(pt):
-                    return refuge
-            except Exception:
-                continue
-    return None
+    # Candidates come from the spatial index over the cached refuge geometries,
+    # which are prepared, so the exact covers test does not rebuild edge indexes
+    index = _refuge_index()
+    if index["tree"] is None:
+        return None
+    # The tree's envelope search is the bbox pre-filter; the candidates' exact
+    # covers test then runs as one vectorized call
+    candidates = np.sort(index["tree"].query(pt))
+    if len(candidates) == 0:
+        return None
+    try:
+        hits = candidates[shapely.covers(index["tree"].geometries[candidates], pt)]
+    except Exception:
+        hits = [i for i in candidates if index["geoms"][i].covers(pt)]
+    if len(hits) == 0:
+        return None
+    return index["refuges"][int(hits[0])]
+
 
+def _group_paths_by_refuge(
+    paths: List[Dict[str, Any]],
+    refuges: List[Dict[str, Any]],
+    name_index: Dict[str, Dict[str, Any]] | None = None
+):
+    """Group paths by refuge using a set of path names for quick lookup.
 
-def _group_paths_by_refuge(paths: List[Dict[str, Any]], refuges: List[Dict[str, Any]]):
-    """Group paths by refuge using a set of path names for quick lookup."""
+    ``name_index`` (from _refuge_name_index) saves normalizing every refuge name again.
+    """
     id_index = {r.get('id'): r for r in refuges if isinstance(r.get('id'), int)}
-    name_index = {(r.get('name') or '').strip().lower(): r for r in refuges if isinstance(r.get('name'), str)}
+    if name_index is None:
+        name_index = {(r.get('name') or '').strip().lower(): r for r in refuges if isinstance(r.get('name'), str)}
     grouped = {}
 
     for p in paths:
@@ -297,10 +950,21 @@ def _group_paths_by_refuge(paths: List[Dict[str, Any]], refuges: List[Dict[str,
 @app.route('/api/paths', methods=['GET'])
 def list_paths():
     try:
-        paths = _read_paths()
-        refuges = _read_refuges()
-        grouped = _group_paths_by_refuge(paths, refuges)
-        return jsonify({"status": "success", "paths": paths, "paths_by_refuge": grouped})
+        paths_cache = _paths_snapshot()
+        refuges_cache = _refuges_snapshot()
+        # The response only depends on the paths and the refuges' ids and names, so
+        # it is serialized once and kept on the paths snapshot until either changes;
+        # edits to refuge polygons leave it valid
+        labels = _refuge_labels(refuges_cache)
+        cached = paths_cache.get("response")
+        if cached is not None and (cached[0] is labels or cached[0] == labels):
+            return app.response_class(cached[1], mimetype='application/json')
+        paths = paths_cache["list"]
+        grouped = _group_paths_by_refuge(paths, refuges_cache["list"], _refuge_name_index(refuges_cache))
+        body = _json_dumps({"status": "success", "paths": paths, "paths_by_refuge": grouped})
+        if paths_cache["key"] is not None and refuges_cache["key"] is not None:
+            paths_cache["response"] = (labels, body)
+        return app.response_class(body, mimetype='application/json')
     except Exception as e:
         logger.error(f"Failed to list paths: {e}")
         return jsonify({"status": "error", "message": "Failed to list paths"}), 500
@@ -309,18 +973,14 @@ def list_paths():
 @app.route('/api/paths', methods=['POST'])
 def create_path():
     try:
-        payload = request.json or {}
+        payload = _json_body() or {}
         name = str(payload.get('name', '')).strip()
         if not name:
             return jsonify({"status": "error", "message": "Name is required"}), 400
 
-        paths = _read_paths()
-        next_id = 1
-        try:
-            if paths:
-                next_id = max(int(p.get('id', 0) or 0) for p in paths) + 1
-        except Exception:
-            next_id = len(paths) + 1
+        paths_cache = _paths_snapshot()
+        paths = list(paths_cache["list"])
+        next_id = max(_path_positions(paths_cache), default=0) + 1
 
         new_path = {
             "id": next_id,
@@ -336,7 +996,7 @@ def create_path():
             "refuge_name": None
         }
         paths.append(new_path)
-        _write_paths(paths)
+        _save_paths(paths)
         return jsonify({"status": "success", "path": new_path}), 201
     except Exception as e:
         logger.error(f"Failed to create path: {e}")
@@ -346,7 +1006,7 @@ def create_path():
 @app.route('/api/paths/<int:path_id>', methods=['PUT'])
 def update_path(path_id: int):
     try:
-        payload = request.json or {}
+        payload = _json_body() or {}
         name = str(payload.get('name', '')).strip()
         if not name:
             return jsonify({"status": "error", "message": "Name is required"}), 400
@@ -374,24 +1034,23 @@ def update_path(path_id: int):
         if not matched_refuge:
             return jsonify({"status": "error", "message": "Path endpoint must be inside a refuge area"}), 400
 
-        paths = _read_paths()
-        updated = False
-        for p in paths:
-            if int(p.get('id', 0) or 0) == path_id:
-                p['name'] = name
-                p['points'] = points
-                p['markers'] = markers
-                p['pathname_pups'] = pathname_pups
-                p['refuge_id'] = matched_refuge.get('id')
-                p['refuge_name'] = matched_refuge.get('name')
-                updated = True
-                break
-
-        if not updated:
+        paths_cache = _paths_snapshot()
+        i = _path_position(paths_cache, path_id)
+        if i is None:
             return jsonify({"status": "error", "message": "Path not found"}), 404
 
-        _write_paths(paths)
-        return jsonify({"status": "success", "path": next((p for p in paths if int(p.get('id', 0) or 0) == path_id), None)})
+        paths = list(paths_cache["list"])
+        p = dict(paths[i])
+        paths[i] = p
+        p['name'] = name
+        p['points'] = points
+        p['markers'] = markers
+        p['pathname_pups'] = pathname_pups
+        p['refuge_id'] = matched_refuge.get('id')
+        p['refuge_name'] = matched_refuge.get('name')
+
+        _save_paths(paths)
+        return jsonify({"status": "success", "path": p})
     except Exception as e:
         logger.error(f"Failed to update path {path_id}: {e}")
         return jsonify({"status": "error", "message": "Failed to update path"}), 500
@@ -400,7 +1059,7 @@ def update_path(path_id: int):
 @app.route('/api/paths/<int:path_id>/popups', methods=['POST'])
 def add_path_popup(path_id: int):
     try:
-        payload = request.json or {}
+        payload = _json_body() or {}
         caption = str(payload.get('caption', '')).strip()
         image_url = str(payload.get('image_url', '')).strip()
         point_index = payload.get('point_index')
@@ -410,43 +1069,26 @@ def add_path_popup(path_id: int):
         if not caption and not image_url:
             return jsonify({"status": "error", "message": "Caption or image required"}), 400
 
-        paths = _read_paths()
-        target = None
-        for p in paths:
-            if int(p.get('id', 0) or 0) == path_id:
-                target = p
-                break
-
-        if target is None:
+        paths_cache = _paths_snapshot()
+        target_idx = _path_position(paths_cache, path_id)
+        if target_idx is None:
             return jsonify({"status": "error", "message": "Path not found"}), 404
+        paths = list(paths_cache["list"])
+        target = paths[target_idx]
 
         points = target.get('points')
         if not isinstance(points, list) or not points:
             return jsonify({"status": "error", "message": "Path has no points to attach popup"}), 400
 
-        def _coerce_float(val):
-            try:
-                return float(val)
-            except (TypeError, ValueError):
-                return None
-
         def _nearest_point_idx(points_list, ref_lat, ref_lng):
             if ref_lat is None or ref_lng is None:
                 return None
-            best_idx = None
-            best_dist = None
-            for idx, pt in enumerate(points_list):
-                if not isinstance(pt, dict):
-                    continue
-                p_lat = _coerce_float(pt.get('lat'))
-                p_lng = _coerce_float(pt.get('lng'))
-                if p_lat is None or p_lng is None:
-                    continue
-                dist = (p_lat - ref_lat) ** 2 + (p_lng - ref_lng) ** 2
-                if best_dist is None or dist < best_dist:
-                    best_dist = dist
-                    best_idx = idx
-            return best_idx
+            coords = _path_point_coords(path_id, points_list)
+            dist = (coords[:, 0] - ref_lat) ** 2 + (coords[:, 1] - ref_lng) ** 2
+            usable = ~np.isnan(dist)
+            if not usable.any():
+                return None
+            return int(np.argmin(np.where(usable, dist, np.inf)))
 
         lat_val = _coerce_float(lat)
         lng_val = _coerce_float(lng)
@@ -476,8 +1118,7 @@ def add_path_popup(path_id: int):
             return jsonify({"status": "error", "message": "Popup location is missing coordinates"}), 400
 
         pups = target.get('pathname_pups')
-        if not isinstance(pups, dict):
-            pups = {}
+        pups = dict(pups) if isinstance(pups, dict) else {}
 
         key = str(idx_val)
         pups[key] = {
@@ -487,42 +1128,49 @@ def add_path_popup(path_id: int):
             "lat": attach_lat,
             "lng": attach_lng
         }
+        target = dict(target)
         target['pathname_pups'] = pups
-        _write_paths(paths)
+        paths[target_idx] = target
+        _save_paths(paths)
         return jsonify({"status": "success", "popup": pups.get(key), "path": target}), 201
     except Exception as e:
         logger.error(f"Failed to add popup to path {path_id}: {e}")
         return jsonify({"status": "error", "message": "Failed to add popup"}), 500
 
 
+# Shapely geometries are immutable, so one empty result can be shared by all callers
+_EMPTY_MULTIPOLYGON = ShpMultiPolygon()
+
+
 def _make_valid_polygonal(geom: BaseGeometry) -> BaseGeometry:
     if geom is None:
-        return ShpMultiPolygon([])
+        return _EMPTY_MULTIPOLYGON
     g = geom
+    # One GEOS validity check decides both: a valid polygonal geometry needs neither
+    # repair nor part filtering
     try:
+        valid = g.is_valid
+    except Exception:
+        valid = False
+    if valid and g.geom_type in ("Polygon", "MultiPolygon"):
+        return g
+    if not valid:
         try:
-            from shapely import make_valid as _make_valid
+            g = make_valid(g)
         except Exception:
+            # Last resort when GEOS cannot repair the geometry
             try:
-                from shapely.validation import make_valid as _make_valid
+                g = g.buffer(0)
             except Exception:
-                _make_valid = None
-        if not g.is_valid:
-            g = _make_valid(g) if _make_valid else g.buffer(0)
-    except Exception:
-        try:
-            g = g.buffer(0)
-        except Exception:
-            pass
+                pass
 
     try:
         if g.geom_type in ("Polygon", "MultiPolygon"):
             return g
         if hasattr(g, 'geoms'):
-            polygon_parts = []
-            for part in g.geoms:
-                if part.geom_type in ("Polygon", "MultiPolygon"):
-                    polygon_parts.append(part)
+            # Type ids 3 and 6 are Polygon and MultiPolygon
+            parts = shapely.get_parts(g)
+            polygon_parts = list(parts[np.isin(shapely.get_type_id(parts), (3, 6))])
             if polygon_parts:
                 try:
                     return unary_union(polygon_parts)
@@ -540,74 +1188,193 @@ def _make_valid_polygonal(geom: BaseGeometry) -> BaseGeometry:
         return g
 
 
-def _safe_unary_union(geoms: List[BaseGeometry]) -> BaseGeometry:
+def _clean_polygonal(geoms: List[BaseGeometry]) -> List[BaseGeometry]:
+    """Drop empty inputs and repair the rest with _make_valid_polygonal.
+
+    Emptiness, type and validity are checked for the whole list in one
+    vectorized call each, so only geometries that need repair are visited
+    individually.
+    """
+    candidates = [g for g in geoms if g is not None]
+    try:
+        arr = np.empty(len(candidates), dtype=object)
+        arr[:] = candidates
+        non_empty = ~shapely.is_empty(arr)
+        ready = non_empty & np.isin(shapely.get_type_id(arr), (3, 6)) & shapely.is_valid(arr)
+    except Exception:
+        non_empty = ready = None
+
     cleaned: List[BaseGeometry] = []
-    for geom in geoms:
-        if not geom:
-            continue
-        try:
-            if geom.is_empty:
+    for i, geom in enumerate(candidates):
+        if ready is not None:
+            if ready[i]:
+                cleaned.append(geom)
+                continue
+            if not non_empty[i]:
+                continue
+        else:
+            try:
+                if geom.is_empty:
+                    continue
+            except Exception:
                 continue
-        except Exception:
-            continue
         try:
             cleaned_geom = _make_valid_polygonal(geom)
         except Exception:
             cleaned_geom = geom
         if cleaned_geom and not cleaned_geom.is_empty:
             cleaned.append(cleaned_geom)
+    return cleaned
+
+
+def _safe_unary_union(geoms: List[BaseGeometry], trusted: bool = False) -> BaseGeometry:
+    # unary_union already runs GEOS's cascaded union over an STRtree, so the
+    # inputs are passed in one call rather than pre-chunked. The result is
+    # always valid and polygonal, so callers need not repair it again.
+    # ``trusted`` inputs (cached refuge geometries, parsed overlays and earlier
+    # results, already valid, polygonal and non-empty) skip the per-geometry
+    # validity checks of _clean_polygonal.
+    cleaned = list(geoms) if trusted else _clean_polygonal(geoms)
 
     if not cleaned:
-        return ShpMultiPolygon([])
+        return _EMPTY_MULTIPOLYGON
     if len(cleaned) == 1:
         return cleaned[0]
 
     try:
         result = unary_union(cleaned)
-        if not result.is_valid:
-            result = result.buffer(0)
         return _make_valid_polygonal(result)
     except Exception as exc:
-        logger.warning(f"unary_union failed; falling back to pairwise union: {exc}")
-        result = cleaned[0]
-        for geom in cleaned[1:]:
-            if not result or result.is_empty:
-                result = geom
-                continue
+        logger.warning(f"unary_union failed; falling back to partitioned union: {exc}")
+        return _split_union(cleaned)
+
+
+# Groups at most this large are merged one geometry at a time
+_PAIRWISE_UNION_MAX = 4
+
+
+def _pairwise_union(geoms: List[BaseGeometry]) -> BaseGeometry:
+    result = geoms[0] if geoms else _EMPTY_MULTIPOLYGON
+    for geom in geoms[1:]:
+        if not result or result.is_empty:
+            result = geom
+            continue
+        try:
+            merged = result.union(geom)
+        except Exception:
             try:
-                merged = result.union(geom)
-            except Exception:
-                try:
-                    merged = unary_union([result, geom])
-                except Exception as pair_exc:
-                    logger.warning(f"Pairwise union failed, skipping overlay: {pair_exc}")
-                    continue
-            if not merged.is_valid:
-                try:
-                    merged = merged.buffer(0)
-                except Exception:
-                    pass
-            result = _make_valid_polygonal(merged)
-        return result
+                merged = unary_union([result, geom])
+            except Exception as pair_exc:
+                logger.warning(f"Pairwise union failed, skipping overlay: {pair_exc}")
+                continue
+        result = _make_valid_polygonal(merged)
+    return result
+
+
+def _split_union(geoms: List[BaseGeometry]) -> BaseGeometry:
+    """Union geometries whose unary_union failed by splitting them spatially.
+
+    The inputs are halved at the median of their bbox centres along the wider
+    axis and each half is unioned on its own, splitting again only if that
+    fails too; the partial results are then merged. A bad geometry thus only
+    costs a pairwise loop over a small neighbourhood instead of the whole input.
+    """
+    if len(geoms) <= _PAIRWISE_UNION_MAX:
+        return _pairwise_union(geoms)
+    try:
+        arr = np.empty(len(geoms), dtype=object)
+        arr[:] = geoms
+        bounds = shapely.bounds(arr)
+        cx = bounds[:, 0] + bounds[:, 2]
+        cy = bounds[:, 1] + bounds[:, 3]
+        centres = cx if np.ptp(cx) >= np.ptp(cy) else cy
+        order = np.argsort(centres, kind='stable')
+    except Exception:
+        order = np.arange(len(geoms))
+    half = len(geoms) // 2
+
+    parts: List[BaseGeometry] = []
+    for positions in (order[:half], order[half:]):
+        group = [geoms[i] for i in positions]
+        try:
+            part = _make_valid_polygonal(unary_union(group))
+        except Exception:
+            part = _split_union(group)
+        if part and not part.is_empty:
+            parts.append(part)
+    return _pairwise_union(parts)
+
+
+# Precision grid (degrees) for the snap-rounded overlay fallback, ~0.1 mm
+_OVERLAY_GRID_SIZE = 1e-9
+
 
 def _safe_difference(a: BaseGeometry, b: BaseGeometry) -> BaseGeometry:
+    # Disjoint envelopes: nothing to subtract, skip the overlay entirely
+    try:
+        aminx, aminy, amaxx, amaxy = a.bounds
+        bminx, bminy, bmaxx, bmaxy = b.bounds
+        if bminx > amaxx or bmaxx < aminx or bminy > amaxy or bmaxy < aminy:
+            return a
+    except Exception:
+        pass
     try:
         return a.difference(b)
     except Exception:
+        aa, bb = a, b
         try:
-            aa = a if a.is_valid else a.buffer(0)
-            bb = b if b.is_valid else b.buffer(0)
+            aa = _make_valid_polygonal(a)
+            bb = _make_valid_polygonal(b)
             return aa.difference(bb)
         except Exception:
-            # Optional overlay fallback on Shapely 2
+            # Snap-rounded overlay: slightly coarser, but robust to the precision
+            # problems that make the exact overlay throw
             try:
-                from shapely import overlay
-                return overlay(a, b, how='difference')
+                return shapely.difference(aa, bb, grid_size=_OVERLAY_GRID_SIZE)
             except Exception:
                 # Give up and return original to allow subsequent checks to fail gracefully
                 return a
 
 
+def _subtract_all(geom: BaseGeometry, others: List[BaseGeometry]) -> BaseGeometry:
+    """Subtract every geometry in ``others`` from ``geom``.
+
+    ``others`` (valid and polygonal, as _parse_overlays returns them) are
+    unioned first so GEOS runs a single difference; they are only
+    subtracted one at a time if that fails. ``geom`` is prepared in place; for a
+    refuge's cached geometry (see _refuge_geometry) that is a no-op, as the
+    index already prepared it.
+    """
+    if not others:
+        return geom
+    # Overlays that do not touch geom cannot change it. Their boxes are checked
+    # first with numpy, then geom is prepared so the exact intersects tests on the
+    # remaining ones share one GEOS index instead of rebuilding it per overlay.
+    try:
+        minx, miny, maxx, maxy = geom.bounds
+        ob = shapely.bounds(others)
+        near = (ob[:, 0] <= maxx) & (ob[:, 2] >= minx) & (ob[:, 1] <= maxy) & (ob[:, 3] >= miny)
+        others = [o for o, hit in zip(others, near) if hit]
+        if not others:
+            return geom
+        shapely.prepare(geom)
+        others = [o for o, hit in zip(others, shapely.intersects(geom, others)) if hit]
+    except Exception:
+        pass
+    if not others:
+        return geom
+    if len(others) == 1:
+        return _safe_difference(geom, others[0])
+    try:
+        return _safe_difference(geom, _safe_unary_union(others, trusted=True))
+    except Exception as exc:
+        logger.warning(f"Union-based subtraction failed; subtracting one by one: {exc}")
+    result = geom
+    for other in others:
+        result = _safe_difference(result, other)
+    return result
+
+
 def _count_components(geom: BaseGeometry) -> int:
     """Return the number of polygonal components in a geometry."""
     if geom is None:
@@ -623,7 +1390,7 @@ def _count_components(geom: BaseGeometry) -> int:
         return 1
     if geom_type == "MultiPolygon":
         try:
-            return sum(1 for g in geom.geoms if g and not g.is_empty)
+            return int(np.count_nonzero(~shapely.is_empty(shapely.get_parts(geom))))
         except Exception:
             geoms = getattr(geom, "geoms", []) or []
             return len(geoms)
@@ -638,12 +1405,439 @@ def _count_components(geom: BaseGeometry) -> int:
     return 0
 
 
+def _set_refuge_geometry(refuge: Dict[str, Any], geom: BaseGeometry) -> Dict[str, Any]:
+    """Store a validated geometry on a refuge record.
+
+    Besides the GeoJSON ``polygon`` served to clients, the record keeps a base64
+    WKB copy so the geometry can be rehydrated without re-parsing the GeoJSON and
+    repairing it again.
+    """
+    geojson = shapely_mapping(geom)
+    refuge['polygon'] = {
+        "type": geojson.get("type"),
+        "coordinates": geojson.get("coordinates")
+    }
+    refuge['wkb_b64'] = base64.b64encode(shapely_wkb.dumps(geom)).decode('ascii')
+    return refuge
+
+
+# Optional tolerance (in degrees, 1e-6 is ~0.1 m at the equator): vertices closer
+# than this to the simplified outline are dropped from incoming polygons.
+# Optional grid (in degrees, 1e-7 is ~1 cm) that incoming coordinates are snapped
+# to, so GEOS sees fewer near-duplicate vertices in the overlays.
+# Both change saved shapes slightly, hence off (0) by default.
+SIMPLIFY_TOLERANCE_DEG = float(os.getenv('SIMPLIFY_TOL', '0'))
+INPUT_GRID_SIZE_DEG = float(os.getenv('INPUT_GRID_SIZE', '0'))
+
+
+# Largest number of vertices (all rings together) accepted for a new refuge polygon
+MAX_POLYGON_VERTICES = int(os.getenv('MAX_POLYGON_VERTICES', '100000'))
+
+
+def _is_polygon_geojson(obj: Any) -> bool:
+    """Whether ``obj`` is a GeoJSON Polygon dict whose shell has at least four positions."""
+    if not isinstance(obj, dict) or obj.get('type') != 'Polygon':
+        return False
+    rings = obj.get('coordinates')
+    return isinstance(rings, list) and bool(rings) and isinstance(rings[0], list) and len(rings[0]) >= 4
+
+
+def _polygon_coords_error(polygon: Dict[str, Any]) -> str | None:
+    """Return why a GeoJSON Polygon's coordinates cannot be saved, or None.
+
+    Checked on the raw rings before Shapely sees them: the vertex count first,
+    then each ring as one NumPy array for its shape and for finite lng/lat
+    values in range.
+    """
+    rings = polygon.get('coordinates')
+    if not isinstance(rings, list) or not all(isinstance(r, list) for r in rings):
+        return "Invalid polygon coordinates"
+    if sum(len(r) for r in rings) > MAX_POLYGON_VERTICES:
+        return "Polygon has too many vertices"
+    for ring in rings:
+        try:
+            a = np.asarray(ring, dtype=np.float64)
+        except Exception:
+            return "Invalid polygon coordinates"
+        if a.ndim != 2 or a.shape[0] < 4 or a.shape[1] < 2:
+            return "Invalid polygon coordinates"
+        lng, lat = a[:, 0], a[:, 1]
+        if not ((np.abs(lng) <= 180) & (np.abs(lat) <= 90)).all():
+            return "Polygon coordinates are out of range"
+    return None
+
+
+def _polygon_from_coords(coords: List[Any]) -> BaseGeometry:
+    shell = np.asarray(coords[0], dtype=np.float64)
+    holes = [np.asarray(h, dtype=np.float64) for h in coords[1:]]
+    return shapely.polygons(shell, holes=holes or None)
+
+
+def _geom_from_geojson(obj: Dict[str, Any], simplify: bool = True) -> BaseGeometry:
+    """Build a geometry from an incoming GeoJSON dict.
+
+    Polygon rings are converted to NumPy arrays and handed to Shapely's array
+    constructors in one call each. Anything else, or input those reject (empty or
+    ragged rings), goes through shape(), so the accepted payloads are unchanged.
+    Unless ``simplify`` is off, the result is simplified by SIMPLIFY_TOLERANCE_DEG.
+    """
+    geom = None
+    try:
+        gtype = obj.get('type')
+        coords = obj.get('coordinates')
+        if gtype == 'Polygon':
+            geom = _polygon_from_coords(coords)
+        elif gtype == 'MultiPolygon' and coords:
+            geom = shapely.multipolygons([_polygon_from_coords(p) for p in coords])
+    except Exception:
+        geom = None
+    if geom is None:
+        geom = shapely_shape(obj)
+    return _simplify_incoming(geom) if simplify else geom
+
+
+def _polygons_from_geojson(objs: List[Dict[str, Any]]) -> np.ndarray:
+    """Build GeoJSON Polygon dicts into Polygons with one ragged-array constructor call.
+
+    All rings are concatenated into a single coordinate array; ``indices`` then
+    group the coordinates into rings and the rings into polygons (the first ring
+    of each being its shell). Raises if any ring is malformed, so callers can
+    fall back to building the items one by one.
+    """
+    coords: List[Any] = []
+    ring_idx: List[int] = []
+    poly_idx: List[int] = []
+    for p, obj in enumerate(objs):
+        for ring in obj['coordinates']:
+            ring_idx.extend([len(poly_idx)] * len(ring))
+            poly_idx.append(p)
+            coords.extend(ring)
+    rings = shapely.linearrings(np.asarray(coords, dtype=np.float64), indices=ring_idx)
+    return shapely.polygons(rings, indices=poly_idx)
+
+
+def _parse_overlays(items: List[Any], types: tuple) -> List[BaseGeometry]:
+    """Parse overlay GeoJSON dicts of the given types into valid polygonal geometries.
+
+    Other items are skipped. Polygon overlays are built together by
+    _polygons_from_geojson and all overlays are simplified in one call; emptiness
+    and validity are then checked in one vectorized pass, so only broken
+    overlays are repaired one by one.
+    """
+    wanted = [
+        o for o in items
+        if isinstance(o, dict) and o.get('type') in types and o.get('coordinates')
+    ]
+    polygon_items = [o for o in wanted if o['type'] == 'Polygon']
+    parsed: List[BaseGeometry] = []
+    if polygon_items:
+        try:
+            parsed.extend(_polygons_from_geojson(polygon_items))
+            wanted = [o for o in wanted if o['type'] != 'Polygon']
+        except Exception:
+            pass
+    for overlay in wanted:
+        try:
+            parsed.append(_geom_from_geojson(overlay, simplify=False))
+        except Exception as exc:
+            logger.warning(f"Failed to parse overlay: {exc}")
+    parsed = _simplify_incoming_many(parsed)
+    return [g for g in _clean_polygonal(parsed) if g.geom_type in ("Polygon", "MultiPolygon")]
+
+
+def _simplify_incoming(geom: BaseGeometry) -> BaseGeometry:
+    """Drop redundant vertices from a drawn geometry before any overlay work.
+
+    Stored refuges are never simplified again, so shared edges produced by the
+    subtractions stay exact. With INPUT_GRID_SIZE set the coordinates are also
+    snapped to that grid.
+    """
+    return _simplify_incoming_many([geom])[0]
+
+
+def _simplify_incoming_many(geoms: List[BaseGeometry]) -> List[BaseGeometry]:
+    """Like _simplify_incoming for a list of geometries, with one vectorized call per step.
+
+    A geometry that a step would reduce to nothing is kept as it was.
+    """
+    if not geoms or (SIMPLIFY_TOLERANCE_DEG <= 0 and INPUT_GRID_SIZE_DEG <= 0):
+        return geoms
+    try:
+        out = np.empty(len(geoms), dtype=object)
+        out[:] = geoms
+        if SIMPLIFY_TOLERANCE_DEG > 0:
+            simplified = shapely.simplify(out, SIMPLIFY_TOLERANCE_DEG, preserve_topology=True)
+            out = np.where(shapely.is_empty(simplified), out, simplified)
+        if INPUT_GRID_SIZE_DEG > 0:
+            snapped = shapely.set_precision(out, INPUT_GRID_SIZE_DEG)
+            out = np.where(shapely.is_empty(snapped), out, snapped)
+        return list(out)
+    except Exception:
+        return geoms
+
+
+def _load_refuge_geometry(refuge: Dict[str, Any]) -> BaseGeometry | None:
+    """Return the validated geometry of a stored refuge, preferring its WKB copy."""
+    wkb_b64 = refuge.get('wkb_b64')
+    if isinstance(wkb_b64, str):
+        try:
+            return shapely_wkb.loads(base64.b64decode(wkb_b64))
+        except Exception as exc:
+            logger.warning(f"Ignoring unreadable WKB for refuge {refuge.get('id')}: {exc}")
+
+    # Legacy records only carry GeoJSON
+    g = refuge.get('polygon')
+    if not g or not isinstance(g, dict) or g.get('type') not in ("Polygon", "MultiPolygon"):
+        return None
+    return _make_valid_polygonal(shapely_shape(g))
+
+
+# Shapely's vectorized functions release the GIL, so bulk loads of large stores can
+# be split across threads. Off by default: gunicorn workers already use the cores.
+GEOM_THREADS = max(1, int(os.getenv('GEOM_THREADS', '1')))
+_PARALLEL_MIN_ITEMS = 2000
+_geom_pool = {"executor": None, "pid": None}
+
+
+def _parallel_vectorized(func, items):
+    """Apply a vectorized Shapely function, in GEOM_THREADS chunks for large inputs."""
+    if GEOM_THREADS <= 1 or len(items) < _PARALLEL_MIN_ITEMS:
+        return func(items)
+    # Pool threads do not survive fork, so a pool from a preloading parent is unusable
+    if _geom_pool["pid"] != os.getpid():
+        _geom_pool["executor"] = ThreadPoolExecutor(max_workers=GEOM_THREADS)
+        _geom_pool["pid"] = os.getpid()
+    arr = np.empty(len(items), dtype=object)
+    arr[:] = items
+    chunks = np.array_split(arr, GEOM_THREADS)
+    return np.concatenate(list(_geom_pool["executor"].map(func, chunks)))
+
+
+def _load_refuge_geometries(refuges: List[Dict[str, Any]]) -> List[BaseGeometry | None]:
+    """Load the geometries of many stored refuges at once.
+
+    Same result as calling _load_refuge_geometry per record, but WKB blobs and
+    legacy GeoJSON polygons are each decoded (and repaired) with a single call to
+    Shapely's vectorized array API instead of one Python-level call per refuge
+    (split across GEOM_THREADS threads for large stores).
+    """
+    geoms: List[BaseGeometry | None] = [None] * len(refuges)
+    wkb_pos: List[int] = []
+    wkb_blobs: List[bytes] = []
+    geojson_pos: List[int] = []
+    geojson_docs: List[bytes] = []
+    for i, r in enumerate(refuges):
+        wkb_b64 = r.get('wkb_b64')
+        if isinstance(wkb_b64, str):
+            try:
+                wkb_blobs.append(base64.b64decode(wkb_b64))
+                wkb_pos.append(i)
+                continue
+            except Exception:
+                pass
+        g = r.get('polygon')
+        if g and isinstance(g, dict) and g.get('type') in ("Polygon", "MultiPolygon"):
+            geojson_pos.append(i)
+            geojson_docs.append(_json_dumps(g))
+
+    def _load_one_by_one(positions: List[int]):
+        for i in positions:
+            try:
+                geoms[i] = _load_refuge_geometry(refuges[i])
+            except Exception:
+                geoms[i] = None
+
+    if wkb_pos:
+        try:
+            for i, geom in zip(wkb_pos, _parallel_vectorized(shapely.from_wkb, wkb_blobs)):
+                geoms[i] = geom
+        except Exception:
+            # A single unreadable record fails the whole array call
+            _load_one_by_one(wkb_pos)
+
+    if geojson_pos:
+        try:
+            parsed = _parallel_vectorized(shapely.from_geojson, geojson_docs)
+            invalid = ~_parallel_vectorized(shapely.is_valid, parsed)
+            if invalid.any():
+                parsed[invalid] = shapely.make_valid(parsed[invalid])
+            for i, geom in zip(geojson_pos, parsed):
+                if geom.geom_type not in ("Polygon", "MultiPolygon"):
+                    geom = _make_valid_polygonal(geom)
+                geoms[i] = geom
+        except Exception:
+            _load_one_by_one(geojson_pos)
+
+    return geoms
+
+
+def _public_refuge(refuge: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a refuge record without internal storage fields, for API responses."""
+    if 'wkb_b64' not in refuge:
+        return refuge
+    return {k: v for k, v in refuge.items() if k != 'wkb_b64'}
+
+
+# The most recently built index, used to carry geometries over to the next snapshot
+_last_refuge_index: Dict[str, Any] = {"index": None}
+
+
+def _refuge_index(cache: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Return parsed refuge geometries and an STRtree over them for a cache snapshot.
+
+    ``refuges[i]`` is the record whose validated, prepared geometry is ``geoms[i]``.
+    """
+    if cache is None:
+        cache = _refuges_snapshot()
+    index = cache.get("index")
+    if index is not None:
+        return index
+
+    # Geometries of records carried over unchanged from the previous index are reused
+    records = cache["list"]
+    previous = _last_refuge_index.get("index")
+    reusable = {}
+    if previous is not None:
+        reusable = {id(r): (r, g) for r, g in zip(previous["refuges"], previous["geoms"])}
+    loaded: List[BaseGeometry | None] = [None] * len(records)
+    missing: List[int] = []
+    for i, r in enumerate(records):
+        hit = reusable.get(id(r))
+        if hit is not None and hit[0] is r:
+            loaded[i] = hit[1]
+        else:
+            missing.append(i)
+    if missing:
+        for i, geom in zip(missing, _load_refuge_geometries([records[i] for i in missing])):
+            loaded[i] = geom
+
+    indexed_refuges: List[Dict[str, Any]] = []
+    geoms: List[BaseGeometry] = []
+    for r, geom in zip(records, loaded):
+        try:
+            if geom is None or geom.is_empty:
+                continue
+        except Exception:
+            continue
+        indexed_refuges.append(r)
+        geoms.append(geom)
+
+    # Prepared once here, before the index is shared, so repeated covers/intersects
+    # tests against a refuge reuse its GEOS edge index (carried-over ones already are)
+    if geoms:
+        try:
+            shapely.prepare(geoms)
+        except Exception as exc:
+            logger.warning(f"Failed to prepare refuge geometries: {exc}")
+
+    index = {
+        "refuges": indexed_refuges,
+        "geoms": geoms,
+        "tree": STRtree(geoms) if geoms else None
+    }
+    if cache.get("key") is not None:
+        cache["index"] = index
+        _last_refuge_index["index"] = index
+    return index
+
+
+def _refuge_geometry(cache: Dict[str, Any], refuge: Dict[str, Any]) -> BaseGeometry | None:
+    """Return the validated geometry of ``refuge``, a record of the snapshot ``cache``.
+
+    Taken from the snapshot's index, already parsed and prepared, instead of
+    decoding the record again; records missing from it are decoded directly.
+    """
+    index = _refuge_index(cache)
+    positions = index.get("positions")
+    if positions is None:
+        positions = {id(r): i for i, r in enumerate(index["refuges"])}
+        index["positions"] = positions
+    i = positions.get(id(refuge))
+    if i is not None and index["refuges"][i] is refuge:
+        return index["geoms"][i]
+    return _load_refuge_geometry(refuge)
+
+
+def _query_intersecting(tree: STRtree, geom):
+    """Query ``tree`` for geometries that actually intersect ``geom`` (or an array of them).
+
+    The predicate is evaluated in GEOS after the envelope search, so refuges whose
+    bounding box merely overlaps are dropped before any overlay work. Falls back to
+    the plain envelope query if the predicate cannot be evaluated.
+    """
+    try:
+        return tree.query(geom, predicate='intersects')
+    except Exception:
+        return tree.query(geom)
+
+
+def _clip_overlays_to_other_refuges(
+    index: Dict[str, Any],
+    overlay_geoms: List[BaseGeometry],
+    exclude_id: int | None,
+    label: str = "Overlay"
+) -> List[BaseGeometry]:
+    """Subtract the other refuges each overlay overlaps from that overlay.
+
+    Each overlay only loses the refuges the STRtree finds for it (refuges
+    without an integer id and the refuge ``exclude_id`` are left out), so an
+    overlay clear of other refuges is kept as is without any overlay
+    operation, and one lying inside a single other refuge is dropped the same
+    way. Overlays left without area are dropped; one whose subtraction fails
+    is kept unchanged.
+    """
+    if index["tree"] is None or not overlay_geoms:
+        return overlay_geoms
+    neighbours: Dict[int, List[BaseGeometry]] = {}
+    overlay_idxs, refuge_idxs = _query_intersecting(index["tree"], overlay_geoms).tolist()
+    for j, i in zip(overlay_idxs, refuge_idxs):
+        rid = index["refuges"][i].get('id')
+        if isinstance(rid, int) and rid != exclude_id:
+            neighbours.setdefault(j, []).append(index["geoms"][i])
+    if not neighbours:
+        return overlay_geoms
+
+    cleaned: List[BaseGeometry] = []
+    for j, overlay_geom in enumerate(overlay_geoms):
+        others = neighbours.get(j)
+        if not others:
+            cleaned.append(overlay_geom)
+            continue
+        try:
+            # An overlay inside a single neighbour is gone entirely: the neighbours'
+            # boxes are checked first, and only those enclosing the overlay's box get
+            # a covers test against their prepared geometry; no overlay is needed
+            ominx, ominy, omaxx, omaxy = overlay_geom.bounds
+            nb = shapely.bounds(others)
+            around = (nb[:, 0] <= ominx) & (nb[:, 1] <= ominy) & (nb[:, 2] >= omaxx) & (nb[:, 3] >= omaxy)
+            if around.any() and shapely.covers(np.asarray(others, dtype=object)[around], overlay_geom).any():
+                logger.info(f"{label} completely overlapped with unrelated refuges; skipping.")
+                continue
+            other = others[0] if len(others) == 1 else _safe_unary_union(others, trusted=True)
+            cleaned_geom = _make_valid_polygonal(_safe_difference(overlay_geom, other))
+            if not cleaned_geom.is_empty and cleaned_geom.area > 0:
+                cleaned.append(cleaned_geom)
+            else:
+                logger.info(f"{label} completely overlapped with unrelated refuges; skipping.")
+        except Exception as exc:
+            logger.warning(f"Failed to subtract unrelated refuges from {label.lower()}: {exc}")
+            # Keep the original overlay if subtraction fails
+            cleaned.append(overlay_geom)
+    return cleaned
+
+
 def _subtract_overlay_from_other_refuges(
     refuges: List[Dict[str, Any]],
     target_id: int,
-    overlay_geom: BaseGeometry
+    overlay_geom: BaseGeometry,
+    index: Dict[str, Any] | None = None
 ) -> tuple[List[Dict[str, Any]], List[int]]:
-    """Subtract overlay geometry from all non-target refuges."""
+    """Subtract overlay geometry from all non-target refuges.
+
+    When ``index`` (from _refuge_index, for the snapshot ``refuges`` came from) is
+    given, refuges that do not intersect the overlay are skipped and the
+    others reuse their already parsed geometry.
+    """
     if overlay_geom is None:
         return refuges, []
 
@@ -655,6 +1849,15 @@ def _subtract_overlay_from_other_refuges(
     if overlay_geom is None or overlay_geom.is_empty:
         return refuges, []
 
+    candidate_geoms = None
+    if index is not None:
+        hits = _query_intersecting(index["tree"], overlay_geom) if index["tree"] is not None else []
+        candidate_geoms = {index["refuges"][i].get('id'): index["geoms"][i] for i in hits}
+        candidate_geoms.pop(target_id, None)
+        # The overlay only touches the target (the usual case): nothing to rewrite
+        if not candidate_geoms:
+            return refuges, []
+
     updated_refuges: List[Dict[str, Any]] = []
     removed_ids: List[int] = []
 
@@ -664,7 +1867,7 @@ def _subtract_overlay_from_other_refuges(
             continue
 
         refuge_id = refuge.get('id')
-        if refuge_id == target_id:
+        if refuge_id == target_id or (candidate_geoms is not None and refuge_id not in candidate_geoms):
             updated_refuges.append(refuge)
             continue
 
@@ -674,7 +1877,11 @@ def _subtract_overlay_from_other_refuges(
             continue
 
         try:
-            geom = _make_valid_polygonal(shapely_shape(polygon))
+            geom = candidate_geoms.get(refuge_id) if candidate_geoms is not None else None
+            if geom is None:
+                geom = _load_refuge_geometry(refuge)
+            if geom is None:
+                raise ValueError("unreadable polygon")
         except Exception as exc:
             logger.warning(f"Skipping refuge {refuge_id} during overlap subtraction: invalid geometry ({exc})")
             updated_refuges.append(refuge)
@@ -704,338 +1911,407 @@ def _subtract_overlay_from_other_refuges(
             continue
 
         try:
-            geojson = shapely_mapping(new_geom)
+            refuge = _set_refuge_geometry(dict(refuge), new_geom)
         except Exception as exc:
             logger.warning(f"Failed to serialize geometry for refuge {refuge_id}: {exc}")
-            updated_refuges.append(refuge)
-            continue
-
-        refuge['polygon'] = {
-            "type": geojson.get("type"),
-            "coordinates": geojson.get("coordinates")
-        }
         updated_refuges.append(refuge)
 
     return updated_refuges, removed_ids
 
 
 
+def _carve_refuge_geometry(
+    polygon: Dict[str, Any],
+    geoms: List[BaseGeometry],
+    tree: STRtree | None,
+    extra_geoms: List[BaseGeometry] = ()
+) -> tuple[BaseGeometry | None, str | None]:
+    """Build a new refuge geometry from GeoJSON, minus any overlap with existing refuges.
+
+    ``tree`` must index ``geoms``. ``extra_geoms`` are refuges not in the tree
+    (created earlier in the same batch), tested directly. Returns
+    ``(geometry, None)`` on success or ``(None, message)`` when the polygon
+    cannot be saved.
+    """
+    error = _polygon_coords_error(polygon)
+    if error:
+        return None, error
+
+    # Build new geometry and subtract overlaps with existing refuges
+    try:
+        new_geom: BaseGeometry = _geom_from_geojson(polygon)
+    except Exception:
+        return None, "Invalid polygon coordinates"
+
+    # Make geometry valid (fix self-intersections) and keep only polygonal parts
+    new_geom = _make_valid_polygonal(new_geom)
+
+    # Collect existing geometries that intersect the new one; the others
+    # cannot affect the subtraction below. Refuges lying entirely inside the new
+    # one are among them, so subtracting their union also carves those holes.
+    candidate_idxs = sorted(_query_intersecting(tree, new_geom)) if tree is not None else []
+    existing_geoms: List[BaseGeometry] = [geoms[i] for i in candidate_idxs]
+    if extra_geoms:
+        try:
+            hits = shapely.intersects(new_geom, extra_geoms)
+        except Exception:
+            hits = [True] * len(extra_geoms)
+        existing_geoms.extend(g for g, hit in zip(extra_geoms, hits) if hit)
+
+    # Subtract overlaps from the new geometry
+    try:
+        # Start from original geometry
+        result_geom = new_geom
+        # No candidate overlaps the new polygon: nothing to union or subtract
+        if existing_geoms:
+            # First, try a fast union-based subtraction
+            union_subtract_ok = False
+            try:
+                existing_union = _safe_unary_union(existing_geoms, trusted=True)
+                result_geom = _safe_difference(result_geom, existing_union)
+                union_subtract_ok = True
+            except Exception as exc:
+                logger.warning(f"Union-based subtraction failed; subtracting refuges one by one: {exc}")
+
+            # Robust fallback: sequentially subtract each existing geometry, so all
+            # overlaps are still removed when the union step above failed.
+            if not union_subtract_ok:
+                for eg in existing_geoms:
+                    try:
+                        if not result_geom.is_empty:
+                            result_geom = _safe_difference(result_geom, eg)
+                    except Exception:
+                        # _safe_difference already has internal fallbacks; call again to be safe
+                        result_geom = _safe_difference(result_geom, eg)
+    except Exception:
+        return None, "Failed to process geometry"
+
+    # Ensure the result has area and is of polygonal type
+    if result_geom.is_empty or result_geom.area <= 0:
+        return None, "Refuge overlaps existing areas completely; nothing to save"
+    # If geometry collection slipped through, keep only polygonal parts
+    if result_geom.geom_type not in ("Polygon", "MultiPolygon"):
+        result_geom = _make_valid_polygonal(result_geom)
+        if result_geom.is_empty or result_geom.geom_type not in ("Polygon", "MultiPolygon"):
+            return None, "Resulting geometry is not a polygon"
+
+    # If subtraction resulted in MultiPolygon, keep only the part containing the first vertex
+    if result_geom.geom_type == "MultiPolygon":
+        try:
+            # Get the first vertex from the original polygon
+            first_coords = polygon['coordinates'][0][0]  # [lng, lat]
+            x, y = float(first_coords[0]), float(first_coords[1])
+            
+            # Keep the polygon containing the first vertex (boundary included), or the
+            # nearest one if none does. Only parts whose bbox holds the vertex can
+            # contain it, so the exact test runs on those alone.
+            parts = shapely.get_parts(result_geom)
+            bounds = shapely.bounds(parts)
+            in_bbox = np.flatnonzero(
+                (bounds[:, 0] <= x) & (x <= bounds[:, 2]) & (bounds[:, 1] <= y) & (y <= bounds[:, 3])
+            )
+            hits = in_bbox[shapely.intersects_xy(parts[in_bbox], x, y)]
+            if len(hits):
+                kept_polygon = parts[int(hits[0])]
+            else:
+                kept_polygon = parts[int(np.argmin(shapely.distance(parts, shapely.points(x, y))))]
+            
+            if kept_polygon and not kept_polygon.is_empty:
+                result_geom = kept_polygon
+                logger.info(f"MultiPolygon result after subtraction: kept only polygon containing first vertex")
+            else:
+                return None, "Could not determine which part to keep after subtraction"
+        except Exception as e:
+            logger.warning(f"Failed to filter MultiPolygon by first vertex: {e}")
+            # Continue with the full MultiPolygon if filtering fails
+
+    return result_geom, None
+
+
+def _next_refuge_id(refuges: List[Dict[str, Any]]) -> int:
+    return (refuges[-1]['id'] + 1) if refuges and isinstance(refuges[-1].get('id'), int) else 1
+
+
+# Serialized public form of each listed refuge, keyed by the record dict's identity.
+# Only records of the current snapshot are kept: "key" is the snapshot the memo
+# was last pruned against.
+_refuge_json_parts: Dict[str, Any] = {"parts": {}, "key": None}
+
+
+def _refuge_json(refuge: Dict[str, Any]) -> bytes:
+    """Return the public JSON of a refuge record, memoized alongside the list fragments.
+
+    A record returned by a write handler is thus serialized once, and the next
+    list response reuses that fragment. Fragments of records replaced or
+    deleted since the last snapshot are dropped first, so the memo never
+    outgrows the refuge list between list responses.
+    """
+    parts = _refuge_json_parts["parts"]
+    hit = parts.get(id(refuge))
+    if hit is not None and hit[0] is refuge:
+        return hit[1]
+    chunk = _json_dumps(_public_refuge(refuge))
+    cache = _refuges_snapshot()
+    if cache["key"] is None:
+        return chunk
+    if _refuge_json_parts["key"] != cache["key"]:
+        live = {id(r) for r in cache["list"]}
+        parts = {k: v for k, v in parts.items() if k in live}
+        _refuge_json_parts.update(parts=parts, key=cache["key"])
+    rid = refuge.get('id')
+    i = _refuge_position(cache, rid) if isinstance(rid, int) else None
+    if i is not None and cache["list"][i] is refuge:
+        parts[id(refuge)] = (refuge, chunk)
+    return chunk
+
+
+def _refuge_response(refuge: Dict[str, Any], status: int = 200):
+    body = b'{"status":"success","refuge":' + _refuge_json(refuge) + b'}'
+    return app.response_class(body, status=status, mimetype='application/json')
+
+
+def _refuges_response_bytes(records: List[Dict[str, Any]], remember: bool = True) -> bytes:
+    """Serialize a refuges list response, reusing the memoized fragments of unchanged records.
+
+    With ``remember`` the fragments of ``records`` replace the memo.
+    """
+    previous = _refuge_json_parts["parts"]
+    parts = {}
+    chunks = []
+    for r in records:
+        hit = previous.get(id(r))
+        if hit is not None and hit[0] is r:
+            chunk = hit[1]
+        else:
+            chunk = _json_dumps(_public_refuge(r))
+        parts[id(r)] = (r, chunk)
+        chunks.append(chunk)
+    if remember:
+        _refuge_json_parts["parts"] = parts
+    return b'{"status":"success","refuges":[' + b','.join(chunks) + b']}'
+
+
 @app.route('/api/refuges', methods=['GET'])
 def list_refuges():
     try:
-        refuges = _read_refuges()
-        return jsonify({"status": "success", "refuges": refuges})
+        cache = _refuges_snapshot()
+        body = cache["response_bytes"]
+        if body is None:
+            body = _refuges_response_bytes(cache["list"], remember=cache["key"] is not None)
+            if cache["key"] is not None:
+                cache["response_bytes"] = body
+        return app.response_class(body, mimetype='application/json')
     except Exception as e:
         logger.error(f"Error listing refuges: {e}")
         return jsonify({"status": "error", "message": "Failed to list refuges"}), 500
 
 
 @app.route('/api/refuges', methods=['POST'])
+@_refuges_transaction
 def create_refuge():
     try:
-        payload = request.get_json(force=True) or {}
+        payload = _json_body() or {}
         # Expected format: { name?: str, polygon: { type: 'Polygon', coordinates: [[[lng,lat],...]] } }
         polygon = payload.get('polygon')
-        if not polygon or polygon.get('type') != 'Polygon' or not polygon.get('coordinates'):
+        if not _is_polygon_geojson(polygon):
             return jsonify({"status": "error", "message": "Invalid polygon"}), 400
 
-        refuges = _read_refuges()
+        cache = _refuges_snapshot()
+        refuges = list(cache["list"])
         # Name validation (required and unique, case-insensitive)
         incoming_name = (payload.get('name') or '').strip()
         if not incoming_name:
             return jsonify({"status": "error", "message": "Name is required"}), 400
         lower_incoming = incoming_name.lower()
-        if any(isinstance(r.get('name'), str) and r.get('name', '').strip().lower() == lower_incoming for r in refuges):
+        if lower_incoming in _refuge_names_lower(cache):
             return jsonify({"status": "error", "message": "A refuge with this name already exists"}), 409
 
-        # Build new geometry and subtract overlaps with existing refuges
-        try:
-            new_geom: BaseGeometry = shapely_shape(polygon)
-        except Exception:
-            return jsonify({"status": "error", "message": "Invalid polygon coordinates"}), 400
+        index = _refuge_index(cache)
+        result_geom, error = _carve_refuge_geometry(polygon, index["geoms"], index["tree"])
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
 
-        # Make geometry valid (fix self-intersections) and keep only polygonal parts
-        new_geom = _make_valid_polygonal(new_geom)
+        new_refuge = _set_refuge_geometry({
+            "id": _next_refuge_id(refuges),
+            "name": incoming_name
+        }, result_geom)
+        refuges.append(new_refuge)
+        _write_refuges(refuges)
+        return _refuge_response(new_refuge, 201)
+    except Exception as e:
+        logger.error(f"Error creating refuge: {e}")
+        return jsonify({"status": "error", "message": "Failed to create refuge"}), 500
 
-        # Collect existing geometries (support Polygon and MultiPolygon already saved)
-        existing_geoms: List[BaseGeometry] = []
-        contained_geoms: List[BaseGeometry] = []
-        for r in refuges:
-            try:
-                g = r.get('polygon')
-                if g and isinstance(g, dict) and g.get('type') in ("Polygon", "MultiPolygon"):
-                    existing_geom = _make_valid_polygonal(shapely_shape(g))
-                    try:
-                        if existing_geom is None or existing_geom.is_empty:
-                            continue
-                    except Exception:
-                        continue
 
-                    existing_geoms.append(existing_geom)
+# Largest number of refuges one batch request may create; the whole batch runs
+# under the store lock, blocking every other writer meanwhile
+MAX_BATCH_REFUGES = int(os.getenv('MAX_BATCH_REFUGES', '100'))
 
-                    # Detect refuges that are fully inside the newly drawn refuge so we can carve holes
-                    try:
-                        if new_geom.covers(existing_geom):
-                            contained_geoms.append(existing_geom)
-                        else:
-                            # Retry with a validity buffer to avoid precision edge cases
-                            buffered_new = new_geom.buffer(0)
-                            if buffered_new.covers(existing_geom):
-                                contained_geoms.append(existing_geom)
-                    except Exception:
-                        try:
-                            buffered_new = new_geom.buffer(0)
-                            if buffered_new.covers(existing_geom):
-                                contained_geoms.append(existing_geom)
-                        except Exception:
-                            pass
-            except Exception:
+
+@app.route('/api/refuges/batch', methods=['POST'])
+@_refuges_transaction
+def create_refuges_batch():
+    """Create several refuges with one read of the store and one atomic write.
+
+    Expected format: { refuges: [{ name: str, polygon: {...} }, ...] }. Each item is
+    validated and carved exactly like POST /api/refuges, including overlaps with
+    refuges created earlier in the same batch. Invalid items are reported in
+    ``errors`` and do not prevent the rest from being saved.
+    """
+    try:
+        payload = _json_body() or {}
+        items = payload.get('refuges')
+        if not items or not isinstance(items, list):
+            return jsonify({"status": "error", "message": "No refuges provided"}), 400
+        if len(items) > MAX_BATCH_REFUGES:
+            return jsonify({
+                "status": "error",
+                "message": f"A batch may create at most {MAX_BATCH_REFUGES} refuges"
+            }), 400
+
+        cache = _refuges_snapshot()
+        refuges = list(cache["list"])
+        index = _refuge_index(cache)
+        # Refuges created by this batch are checked next to the snapshot's tree
+        # instead of rebuilding it after every item
+        batch_geoms: List[BaseGeometry] = []
+        names_lower = set(_refuge_names_lower(cache))
+
+        created: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        for i, item in enumerate(items):
+            polygon = item.get('polygon') if isinstance(item, dict) else None
+            if not _is_polygon_geojson(polygon):
+                errors.append({"index": i, "message": "Invalid polygon"})
                 continue
 
-        # Subtract overlaps from the new geometry
-        try:
-            # Start from original geometry
-            result_geom = new_geom
-            # First carve out any existing refuges that are fully contained so those areas remain untouched
-            if contained_geoms:
-                try:
-                    contained_union = _safe_unary_union(contained_geoms)
-                    if contained_union and not contained_union.is_empty:
-                        result_geom = _safe_difference(result_geom, contained_union)
-                        logger.info(f"New refuge minus {len(contained_geoms)} contained refuges.")
-                except Exception as exc:
-                    logger.warning(f"Failed contained-refuge subtraction via union: {exc}")
-                    for cg in contained_geoms:
-                        try:
-                            if result_geom.is_empty:
-                                break
-                            result_geom = _safe_difference(result_geom, cg)
-                        except Exception:
-                            continue
-            if existing_geoms:
-                # First, try a fast union-based subtraction
-                try:
-                    existing_union = _safe_unary_union(existing_geoms)
-                    result_geom = _safe_difference(result_geom, existing_union)
-                except Exception:
-                    # If union fails for any reason, continue with sequential subtraction below
-                    pass
+            incoming_name = (item.get('name') or '').strip()
+            if not incoming_name:
+                errors.append({"index": i, "message": "Name is required"})
+                continue
+            lower_incoming = incoming_name.lower()
+            if lower_incoming in names_lower:
+                errors.append({"index": i, "message": "A refuge with this name already exists"})
+                continue
 
-                # Robust fallback: sequentially subtract each existing geometry as well.
-                # This ensures that if the union step above partially failed, all overlaps
-                # are still removed.
-                for eg in existing_geoms:
-                    try:
-                        if not result_geom.is_empty:
-                            result_geom = _safe_difference(result_geom, eg)
-                    except Exception:
-                        # _safe_difference already has internal fallbacks; call again to be safe
-                        result_geom = _safe_difference(result_geom, eg)
-        except Exception:
-            return jsonify({"status": "error", "message": "Failed to process geometry"}), 400
+            result_geom, error = _carve_refuge_geometry(polygon, index["geoms"], index["tree"], batch_geoms)
+            if error:
+                errors.append({"index": i, "message": error})
+                continue
 
-        # Ensure the result has area and is of polygonal type
-        if result_geom.is_empty or result_geom.area <= 0:
-            return jsonify({"status": "error", "message": "Refuge overlaps existing areas completely; nothing to save"}), 400
-        # If geometry collection slipped through, keep only polygonal parts
-        if result_geom.geom_type not in ("Polygon", "MultiPolygon"):
-            result_geom = _make_valid_polygonal(result_geom)
-            if result_geom.is_empty or result_geom.geom_type not in ("Polygon", "MultiPolygon"):
-                return jsonify({"status": "error", "message": "Resulting geometry is not a polygon"}), 400
+            new_refuge = _set_refuge_geometry({
+                "id": _next_refuge_id(refuges),
+                "name": incoming_name
+            }, result_geom)
+            refuges.append(new_refuge)
+            created.append(_public_refuge(new_refuge))
+            names_lower.add(lower_incoming)
+            batch_geoms.append(result_geom)
+
+        if not created:
+            return jsonify({"status": "error", "message": "No refuges created", "errors": errors}), 400
 
-        # If subtraction resulted in MultiPolygon, keep only the part containing the first vertex
-        if result_geom.geom_type == "MultiPolygon":
-            try:
-                # Get the first vertex from the original polygon
-                first_coords = polygon['coordinates'][0][0]  # [lng, lat]
-                from shapely.geometry import Point
-                first_point = Point(first_coords[0], first_coords[1])
-                
-                # Find which polygon contains the first vertex
-                kept_polygon = None
-                for poly in result_geom.geoms:
-                    if poly.contains(first_point) or poly.boundary.distance(first_point) < 1e-9:
-                        kept_polygon = poly
-                        break
-                
-                # If no polygon contains the first point exactly, find the nearest one
-                if kept_polygon is None:
-                    min_distance = float('inf')
-                    for poly in result_geom.geoms:
-                        dist = poly.distance(first_point)
-                        if dist < min_distance:
-                            min_distance = dist
-                            kept_polygon = poly
-                
-                if kept_polygon and not kept_polygon.is_empty:
-                    result_geom = kept_polygon
-                    logger.info(f"MultiPolygon result after subtraction: kept only polygon containing first vertex")
-                else:
-                    return jsonify({"status": "error", "message": "Could not determine which part to keep after subtraction"}), 400
-            except Exception as e:
-                logger.warning(f"Failed to filter MultiPolygon by first vertex: {e}")
-                # Continue with the full MultiPolygon if filtering fails
-
-        # Convert back to GeoJSON geometry
-        result_geojson = shapely_mapping(result_geom)
-
-        new_refuge = {
-            "id": (refuges[-1]['id'] + 1) if refuges and isinstance(refuges[-1].get('id'), int) else 1,
-            "name": incoming_name,
-            "polygon": {
-                "type": result_geojson.get("type"),
-                "coordinates": result_geojson.get("coordinates")
-            }
-        }
-        refuges.append(new_refuge)
         _write_refuges(refuges)
-        return jsonify({"status": "success", "refuge": new_refuge}), 201
+        return jsonify({"status": "success", "refuges": created, "errors": errors}), 201
     except Exception as e:
-        logger.error(f"Error creating refuge: {e}")
-        return jsonify({"status": "error", "message": "Failed to create refuge"}), 500
+        logger.error(f"Error creating refuges in batch: {e}")
+        return jsonify({"status": "error", "message": "Failed to create refuges"}), 500
 
 
 @app.route('/api/refuges/<int:refuge_id>', methods=['PUT'])
+@_refuges_transaction
 def update_refuge(refuge_id: int):
     """Update an existing refuge's name. Only name updates are supported for now."""
     try:
-        payload = request.get_json(force=True) or {}
+        payload = _json_body() or {}
         new_name = (payload.get('name') or '').strip()
         if not new_name:
             return jsonify({"status": "error", "message": "Name is required"}), 400
 
-        refuges = _read_refuges()
+        cache = _refuges_snapshot()
+        refuges = list(cache["list"])
         # Find target refuge
-        target = None
-        for r in refuges:
-            if isinstance(r.get('id'), int) and r.get('id') == refuge_id:
-                target = r
-                break
+        target_idx = _refuge_position(cache, refuge_id)
+        target = refuges[target_idx] if target_idx is not None else None
         if not target:
             return jsonify({"status": "error", "message": "Refuge not found"}), 404
 
-        # Ensure unique name (case-insensitive) across other refuges
+        # Ensure unique name (case-insensitive) across other refuges; the target's
+        # own current name only counts if another refuge shares it
         lower_name = new_name.lower()
-        for r in refuges:
-            if r is target:
-                continue
-            if isinstance(r.get('name'), str) and r.get('name', '').strip().lower() == lower_name:
-                return jsonify({"status": "error", "message": "A refuge with this name already exists"}), 409
+        current_name = target.get('name')
+        own_name = isinstance(current_name, str) and current_name.strip().lower() == lower_name
+        if _refuge_names_lower(cache)[lower_name] > (1 if own_name else 0):
+            return jsonify({"status": "error", "message": "A refuge with this name already exists"}), 409
 
+        target = dict(target)
         target['name'] = new_name
+        refuges[target_idx] = target
         _write_refuges(refuges)
-        return jsonify({"status": "success", "refuge": target})
+        return _refuge_response(target)
     except Exception as e:
         logger.error(f"Error updating refuge: {e}")
         return jsonify({"status": "error", "message": "Failed to update refuge"}), 500
 
 
 @app.route('/api/refuges/<int:refuge_id>', methods=['DELETE'])
+@_refuges_transaction
 def delete_refuge(refuge_id: int):
     """Delete a refuge by id."""
     try:
-        refuges = _read_refuges()
-        idx = None
-        for i, r in enumerate(refuges):
-            if isinstance(r.get('id'), int) and r.get('id') == refuge_id:
-                idx = i
-                break
+        cache = _refuges_snapshot()
+        refuges = list(cache["list"])
+        idx = _refuge_position(cache, refuge_id)
         if idx is None:
             return jsonify({"status": "error", "message": "Refuge not found"}), 404
 
         removed = refuges.pop(idx)
         _write_refuges(refuges)
-        return jsonify({"status": "success", "deleted": removed})
+        return jsonify({"status": "success", "deleted": _public_refuge(removed)})
     except Exception as e:
         logger.error(f"Error deleting refuge: {e}")
         return jsonify({"status": "error", "message": "Failed to delete refuge"}), 500
 
 
 @app.route('/api/refuges/<int:refuge_id>/adjoin', methods=['POST'])
+@_refuges_transaction
 def adjoin_overlays(refuge_id: int):
     """Adjoin (union) overlay polygons to an existing refuge."""
     try:
-        payload = request.get_json(force=True) or {}
+        payload = _json_body() or {}
         overlays = payload.get('overlays', [])
         
         if not overlays or not isinstance(overlays, list):
             return jsonify({"status": "error", "message": "No overlays provided"}), 400
         
-        refuges = _read_refuges()
+        cache = _refuges_snapshot()
+        refuges = list(cache["list"])
         
         # Find target refuge
-        target = None
-        target_idx = None
-        for i, r in enumerate(refuges):
-            if isinstance(r.get('id'), int) and r.get('id') == refuge_id:
-                target = r
-                target_idx = i
-                break
+        target_idx = _refuge_position(cache, refuge_id)
+        target = refuges[target_idx] if target_idx is not None else None
         
         if not target:
             return jsonify({"status": "error", "message": "Refuge not found"}), 404
         
         # Get current refuge geometry
         try:
-            current_geom = shapely_shape(target['polygon'])
+            current_geom = _refuge_geometry(cache, target)
         except Exception:
+            current_geom = None
+        if current_geom is None:
             return jsonify({"status": "error", "message": "Stored refuge geometry is invalid"}), 500
-        current_geom = _make_valid_polygonal(current_geom)
         if current_geom.is_empty:
             return jsonify({"status": "error", "message": "Stored refuge geometry is empty"}), 500
         
         # Convert overlays to Shapely geometries
-        overlay_geoms = []
-        for overlay in overlays:
-            try:
-                if overlay.get('type') == 'Polygon' and overlay.get('coordinates'):
-                    geom = shapely_shape(overlay)
-                    if not geom.is_valid:
-                        geom = geom.buffer(0)
-                    overlay_geoms.append(geom)
-            except Exception as e:
-                logger.warning(f"Failed to parse overlay: {e}")
-                continue
+        overlay_geoms = _parse_overlays(overlays, ('Polygon',))
         
         if not overlay_geoms:
             return jsonify({"status": "error", "message": "No valid overlays to adjoin"}), 400
         
         # Before processing overlays, subtract overlapping unrelated refuges from them
-        # Collect all unrelated refuge geometries
-        unrelated_refuge_geoms: List[BaseGeometry] = []
-        for r in refuges:
-            if isinstance(r.get('id'), int) and r.get('id') != refuge_id:
-                try:
-                    g = r.get('polygon')
-                    if g and isinstance(g, dict) and g.get('type') in ("Polygon", "MultiPolygon"):
-                        unrelated_geom = _make_valid_polygonal(shapely_shape(g))
-                        if not unrelated_geom.is_empty:
-                            unrelated_refuge_geoms.append(unrelated_geom)
-                except Exception:
-                    continue
-        
-        # Subtract unrelated refuges from each overlay
-        if unrelated_refuge_geoms:
-            try:
-                unrelated_union = _safe_unary_union(unrelated_refuge_geoms)
-                if not unrelated_union.is_empty:
-                    cleaned_overlay_geoms = []
-                    for overlay_geom in overlay_geoms:
-                        try:
-                            # Subtract unrelated refuges from this overlay
-                            cleaned_geom = _safe_difference(overlay_geom, unrelated_union)
-                            cleaned_geom = _make_valid_polygonal(cleaned_geom)
-                            if not cleaned_geom.is_empty and cleaned_geom.area > 0:
-                                cleaned_overlay_geoms.append(cleaned_geom)
-                            else:
-                                logger.info(f"Overlay completely overlapped with unrelated refuges; skipping.")
-                        except Exception as exc:
-                            logger.warning(f"Failed to subtract unrelated refuges from overlay: {exc}")
-                            # Keep the original overlay if subtraction fails
-                            cleaned_overlay_geoms.append(overlay_geom)
-                    overlay_geoms = cleaned_overlay_geoms
-            except Exception as exc:
-                logger.warning(f"Failed to create union of unrelated refuges: {exc}")
+        overlay_geoms = _clip_overlays_to_other_refuges(_refuge_index(cache), overlay_geoms, refuge_id)
         
         if not overlay_geoms:
             return jsonify({"status": "error", "message": "All overlays completely overlap with other refuges"}), 400
@@ -1043,11 +2319,8 @@ def adjoin_overlays(refuge_id: int):
         # Union all geometries together
         try:
             all_geoms = [current_geom] + overlay_geoms
-            result_geom = _safe_unary_union(all_geoms)
-            
-            # Ensure result is valid
-            if not result_geom.is_valid:
-                result_geom = result_geom.buffer(0)
+            # _safe_unary_union already returns a repaired, polygonal geometry
+            result_geom = _safe_unary_union(all_geoms, trusted=True)
             
             if result_geom.is_empty or result_geom.area <= 0:
                 return jsonify({"status": "error", "message": "Resulting geometry is empty"}), 400
@@ -1055,111 +2328,79 @@ def adjoin_overlays(refuge_id: int):
             logger.error(f"Error adjoining geometries: {e}")
             return jsonify({"status": "error", "message": "Failed to adjoin geometries"}), 500
         
-        # Convert back to GeoJSON
-        result_geojson = shapely_mapping(result_geom)
-        
         # Update refuge with new geometry
-        target['polygon'] = {
-            "type": result_geojson.get("type"),
-            "coordinates": result_geojson.get("coordinates")
-        }
+        target = _set_refuge_geometry(dict(target), result_geom)
         
         refuges[target_idx] = target
         
         # Now subtract the adjoined overlays from other refuges
         # Create union of the overlay geometries that were actually applied
         try:
-            overlays_union = _safe_unary_union(overlay_geoms)
-            overlays_union = _make_valid_polygonal(overlays_union)
+            overlays_union = _safe_unary_union(overlay_geoms, trusted=True)
             if not overlays_union.is_empty:
                 refuges, removed_refuge_ids = _subtract_overlay_from_other_refuges(
                     refuges,
                     target.get('id'),
-                    overlays_union
+                    overlays_union,
+                    _refuge_index(cache)
                 )
+                # The target itself is passed through unchanged, so it needs no re-insert
                 if removed_refuge_ids:
                     logger.info(f"Removed refuges after cross-refuge subtraction in adjoin: {removed_refuge_ids}")
-                
-                # Re-find target index after potential removals
-                target_idx = None
-                for idx, refuge in enumerate(refuges):
-                    if isinstance(refuge, dict) and refuge.get('id') == target.get('id'):
-                        target_idx = idx
-                        break
-                if target_idx is None:
-                    refuges.append(target)
-                    target_idx = len(refuges) - 1
-                
-                refuges[target_idx] = target
         except Exception as exc:
             logger.warning(f"Failed to subtract overlays from other refuges: {exc}")
         
         _write_refuges(refuges)
         
-        return jsonify({"status": "success", "refuge": target})
+        return _refuge_response(target)
     except Exception as e:
         logger.error(f"Error adjoining overlays: {e}")
         return jsonify({"status": "error", "message": "Failed to adjoin overlays"}), 500
 
 
 @app.route('/api/refuges/<int:refuge_id>/subtract', methods=['POST'])
+@_refuges_transaction
 def subtract_overlays(refuge_id: int):
     """Subtract overlay polygons from an existing refuge."""
     try:
-        payload = request.get_json(force=True) or {}
+        payload = _json_body() or {}
         overlays = payload.get('overlays', [])
         
         if not overlays or not isinstance(overlays, list):
             return jsonify({"status": "error", "message": "No overlays provided"}), 400
         
-        refuges = _read_refuges()
+        cache = _refuges_snapshot()
+        refuges = list(cache["list"])
         
         # Find target refuge
-        target = None
-        target_idx = None
-        for i, r in enumerate(refuges):
-            if isinstance(r.get('id'), int) and r.get('id') == refuge_id:
-                target = r
-                target_idx = i
-                break
+        target_idx = _refuge_position(cache, refuge_id)
+        target = refuges[target_idx] if target_idx is not None else None
         
         if not target:
             return jsonify({"status": "error", "message": "Refuge not found"}), 404
         
         # Get current refuge geometry
         try:
-            current_geom = shapely_shape(target['polygon'])
+            current_geom = _refuge_geometry(cache, target)
         except Exception:
+            current_geom = None
+        if current_geom is None:
             return jsonify({"status": "error", "message": "Stored refuge geometry is invalid"}), 500
-        current_geom = _make_valid_polygonal(current_geom)
         if current_geom.is_empty:
             return jsonify({"status": "error", "message": "Stored refuge geometry is empty"}), 500
         
         # Convert overlays to Shapely geometries
-        overlay_geoms = []
-        for overlay in overlays:
-            try:
-                if overlay.get('type') == 'Polygon' and overlay.get('coordinates'):
-                    geom = shapely_shape(overlay)
-                    if not geom.is_valid:
-                        geom = geom.buffer(0)
-                    overlay_geoms.append(geom)
-            except Exception as e:
-                logger.warning(f"Failed to parse overlay: {e}")
-                continue
+        overlay_geoms = _parse_overlays(overlays, ('Polygon',))
         
         if not overlay_geoms:
             return jsonify({"status": "error", "message": "No valid overlays to subtract"}), 400
         
         # Subtract all overlay geometries from current geometry
         try:
-            result_geom = current_geom
-            for overlay_geom in overlay_geoms:
-                result_geom = _safe_difference(result_geom, overlay_geom)
+            result_geom = _subtract_all(current_geom, overlay_geoms)
             
             # Ensure result is valid
-            if not result_geom.is_valid:
-                result_geom = result_geom.buffer(0)
+            result_geom = _make_valid_polygonal(result_geom)
             
             if result_geom.is_empty or result_geom.area <= 0:
                 return jsonify({"status": "error", "message": "Subtraction would remove entire refuge"}), 400
@@ -1167,19 +2408,13 @@ def subtract_overlays(refuge_id: int):
             logger.error(f"Error subtracting geometries: {e}")
             return jsonify({"status": "error", "message": "Failed to subtract geometries"}), 500
         
-        # Convert back to GeoJSON
-        result_geojson = shapely_mapping(result_geom)
-        
         # Update refuge with new geometry
-        target['polygon'] = {
-            "type": result_geojson.get("type"),
-            "coordinates": result_geojson.get("coordinates")
-        }
+        target = _set_refuge_geometry(dict(target), result_geom)
         
         refuges[target_idx] = target
         _write_refuges(refuges)
         
-        return jsonify({"status": "success", "refuge": target})
+        return _refuge_response(target)
     except Exception as e:
         logger.error(f"Error subtracting overlays: {e}")
         return jsonify({"status": "error", "message": "Failed to subtract overlays"}), 500
@@ -1189,7 +2424,7 @@ def subtract_overlays(refuge_id: int):
 def validate_overlay_operation(refuge_id: int):
     """Validate an overlay before applying it during editing."""
     try:
-        payload = request.get_json(force=True) or {}
+        payload = _json_body() or {}
         overlay_payload = payload.get('overlay')
         operation = (payload.get('operation') or '').strip().lower()
 
@@ -1199,36 +2434,50 @@ def validate_overlay_operation(refuge_id: int):
         if not overlay_payload or overlay_payload.get('type') not in ('Polygon', 'MultiPolygon'):
             return jsonify({"status": "error", "message": "Invalid overlay geometry"}), 400
 
-        refuges = _read_refuges()
-        target = None
-        for r in refuges:
-            if isinstance(r.get('id'), int) and r.get('id') == refuge_id:
-                target = r
-                break
+        cache = _refuges_snapshot()
+        target_idx = _refuge_position(cache, refuge_id)
+        target = cache["list"][target_idx] if target_idx is not None else None
 
         if not target:
             return jsonify({"status": "error", "message": "Refuge not found"}), 404
 
         try:
-            current_geom = shapely_shape(target['polygon'])
+            current_geom = _refuge_geometry(cache, target)
         except Exception:
+            current_geom = None
+        if current_geom is None:
             return jsonify({"status": "error", "message": "Stored refuge geometry is invalid"}), 500
-        current_geom = _make_valid_polygonal(current_geom)
         if current_geom.is_empty:
             return jsonify({"status": "error", "message": "Stored refuge geometry is empty"}), 500
 
         try:
-            overlay_geom = shapely_shape(overlay_payload)
+            overlay_geom = _geom_from_geojson(overlay_payload)
         except Exception:
             return jsonify({"status": "error", "message": "Invalid overlay geometry"}), 400
         overlay_geom = _make_valid_polygonal(overlay_geom)
         if overlay_geom.is_empty:
             return jsonify({"status": "error", "message": "Overlay has no area"}), 400
 
+        # Predicate checks first: the stored geometry is prepared, so an overlay that
+        # misses the refuge, or swallows it whole, is answered without an overlay.
+        # A miss leaves the refuge as it is, so one already in several parts is still
+        # reported as fragmented.
+        try:
+            if not current_geom.intersects(overlay_geom):
+                if _count_components(current_geom) > 1:
+                    return jsonify({
+                        "status": "error",
+                        "code": "REFUGE_FRAGMENTATION",
+                        "message": "Overlay subtraction would fragment the refuge"
+                    }), 400
+                return jsonify({"status": "success", "fragmenting": False})
+            if overlay_geom.covers(current_geom):
+                return jsonify({"status": "error", "message": "Overlay subtraction would remove entire refuge"}), 400
+        except Exception:
+            pass
+
+        # Both operands are valid, so the difference needs no repair pass
         result_geom = _safe_difference(current_geom, overlay_geom)
-        result_geom = _make_valid_polygonal(result_geom)
-        if not result_geom.is_valid:
-            result_geom = result_geom.buffer(0)
         if result_geom.is_empty or result_geom.area <= 0:
             return jsonify({"status": "error", "message": "Overlay subtraction would remove entire refuge"}), 400
 
@@ -1246,10 +2495,11 @@ def validate_overlay_operation(refuge_id: int):
 
 
 @app.route('/api/refuges/<int:refuge_id>/apply-overlays', methods=['POST'])
+@_refuges_transaction
 def apply_overlay_changes(refuge_id: int):
     """Apply both adjoin and subtract overlay polygons to an existing refuge in a single transaction."""
     try:
-        payload = request.get_json(force=True) or {}
+        payload = _json_body() or {}
         adjoin_payload = payload.get('adjoin') or []
         subtract_payload = payload.get('subtract') or []
 
@@ -1259,85 +2509,36 @@ def apply_overlay_changes(refuge_id: int):
         if not adjoin_payload and not subtract_payload:
             return jsonify({"status": "error", "message": "No overlays provided"}), 400
 
-        refuges = _read_refuges()
-        target = None
-        target_idx = None
-        for i, r in enumerate(refuges):
-            if isinstance(r.get('id'), int) and r.get('id') == refuge_id:
-                target = r
-                target_idx = i
-                break
+        cache = _refuges_snapshot()
+        refuges = list(cache["list"])
+        target_idx = _refuge_position(cache, refuge_id)
+        target = refuges[target_idx] if target_idx is not None else None
 
         if not target or target_idx is None:
             return jsonify({"status": "error", "message": "Refuge not found"}), 404
 
         try:
-            current_geom = shapely_shape(target['polygon'])
+            current_geom = _refuge_geometry(cache, target)
         except Exception:
+            current_geom = None
+        if current_geom is None:
             return jsonify({"status": "error", "message": "Stored refuge geometry is invalid"}), 500
-        current_geom = _make_valid_polygonal(current_geom)
         if current_geom.is_empty:
             return jsonify({"status": "error", "message": "Stored refuge geometry is empty"}), 500
 
-        def _to_geometries(items: List[Any]) -> List[BaseGeometry]:
-            geoms: List[BaseGeometry] = []
-            for overlay in items:
-                try:
-                    if isinstance(overlay, dict) and overlay.get('type') in ('Polygon', 'MultiPolygon') and overlay.get('coordinates'):
-                        geom = shapely_shape(overlay)
-                        geom = _make_valid_polygonal(geom)
-                        if not geom.is_empty and geom.geom_type in ("Polygon", "MultiPolygon"):
-                            geoms.append(geom)
-                except Exception as exc:
-                    logger.warning(f"Failed to parse overlay during apply-overlays: {exc}")
-            return geoms
-
-        adjoin_geoms = _to_geometries(adjoin_payload)
-        subtract_geoms = _to_geometries(subtract_payload)
+        adjoin_geoms = _parse_overlays(adjoin_payload, ('Polygon', 'MultiPolygon'))
+        subtract_geoms = _parse_overlays(subtract_payload, ('Polygon', 'MultiPolygon'))
 
         # Before processing adjoin overlays, subtract overlapping unrelated refuges from them
         if adjoin_geoms:
-            # Collect all unrelated refuge geometries
-            unrelated_refuge_geoms: List[BaseGeometry] = []
-            for r in refuges:
-                if isinstance(r.get('id'), int) and r.get('id') != refuge_id:
-                    try:
-                        g = r.get('polygon')
-                        if g and isinstance(g, dict) and g.get('type') in ("Polygon", "MultiPolygon"):
-                            unrelated_geom = _make_valid_polygonal(shapely_shape(g))
-                            if not unrelated_geom.is_empty:
-                                unrelated_refuge_geoms.append(unrelated_geom)
-                    except Exception:
-                        continue
-            
-            # Subtract unrelated refuges from each adjoin overlay
-            if unrelated_refuge_geoms:
-                try:
-                    unrelated_union = _safe_unary_union(unrelated_refuge_geoms)
-                    if not unrelated_union.is_empty:
-                        cleaned_adjoin_geoms = []
-                        for adjoin_geom in adjoin_geoms:
-                            try:
-                                # Subtract unrelated refuges from this overlay
-                                cleaned_geom = _safe_difference(adjoin_geom, unrelated_union)
-                                cleaned_geom = _make_valid_polygonal(cleaned_geom)
-                                if not cleaned_geom.is_empty and cleaned_geom.area > 0:
-                                    cleaned_adjoin_geoms.append(cleaned_geom)
-                                else:
-                                    logger.info(f"Adjoin overlay completely overlapped with unrelated refuges; skipping.")
-                            except Exception as exc:
-                                logger.warning(f"Failed to subtract unrelated refuges from adjoin overlay: {exc}")
-                                # Keep the original overlay if subtraction fails
-                                cleaned_adjoin_geoms.append(adjoin_geom)
-                        adjoin_geoms = cleaned_adjoin_geoms
-                except Exception as exc:
-                    logger.warning(f"Failed to create union of unrelated refuges: {exc}")
+            adjoin_geoms = _clip_overlays_to_other_refuges(
+                _refuge_index(cache), adjoin_geoms, refuge_id, "Adjoin overlay"
+            )
 
         adjoin_union_for_others: BaseGeometry | None = None
         if adjoin_geoms:
             try:
-                adjoin_union_for_others = _safe_unary_union(adjoin_geoms)
-                adjoin_union_for_others = _make_valid_polygonal(adjoin_union_for_others)
+                adjoin_union_for_others = _safe_unary_union(adjoin_geoms, trusted=True)
                 if adjoin_union_for_others.is_empty:
                     adjoin_union_for_others = None
             except Exception as exc:
@@ -1350,33 +2551,29 @@ def apply_overlay_changes(refuge_id: int):
 
         if adjoin_geoms:
             try:
-                result_geom = _safe_unary_union([result_geom] + adjoin_geoms)
-                if not result_geom.is_valid:
-                    result_geom = result_geom.buffer(0)
+                # The overlays were already unioned above for the cross-refuge step;
+                # reuse that instead of unioning every overlay again
+                if adjoin_union_for_others is not None:
+                    result_geom = _safe_unary_union([result_geom, adjoin_union_for_others], trusted=True)
+                else:
+                    result_geom = _safe_unary_union([result_geom] + adjoin_geoms, trusted=True)
                 if result_geom.is_empty or result_geom.area <= 0:
                     return jsonify({"status": "error", "message": "Resulting geometry is empty after adjoin"}), 400
 
                 # After adjoining, drop any pieces that are no longer directly connected
                 # to the original refuge area. This prevents "split" islands from being kept.
                 if result_geom.geom_type == "MultiPolygon":
-                    connected_parts: list[BaseGeometry] = []
-                    for poly in result_geom.geoms:
-                        try:
-                            if poly.is_empty:
-                                continue
-                            # Consider a part connected if it intersects or touches the original refuge.
-                            if poly.intersects(current_geom) or poly.touches(current_geom):
-                                connected_parts.append(poly)
-                        except Exception:
-                            continue
+                    # Consider a part connected if it intersects the original refuge
+                    # (touching parts intersect too, so no separate touches test)
+                    parts = shapely.get_parts(result_geom)
+                    parts = parts[~shapely.is_empty(parts)]
+                    connected_parts: list[BaseGeometry] = list(parts[shapely.intersects(parts, current_geom)])
 
                     if connected_parts:
                         if len(connected_parts) == 1:
                             result_geom = connected_parts[0]
                         else:
-                            result_geom = _safe_unary_union(connected_parts)
-                        # Re-validate after filtering
-                        result_geom = _make_valid_polygonal(result_geom)
+                            result_geom = _safe_unary_union(connected_parts, trusted=True)
                         if result_geom.is_empty or result_geom.area <= 0:
                             return jsonify(
                                 {"status": "error", "message": "Resulting geometry became empty after filtering disconnected parts"}
@@ -1394,11 +2591,8 @@ def apply_overlay_changes(refuge_id: int):
                 return jsonify({"status": "error", "message": "Failed to adjoin overlays"}), 500
         if subtract_geoms:
             try:
-                for overlay_geom in subtract_geoms:
-                    result_geom = _safe_difference(result_geom, overlay_geom)
+                result_geom = _subtract_all(result_geom, subtract_geoms)
                 result_geom = _make_valid_polygonal(result_geom)
-                if not result_geom.is_valid:
-                    result_geom = result_geom.buffer(0)
                 if result_geom.is_empty or result_geom.area <= 0:
                     return jsonify({"status": "error", "message": "Overlay subtraction would remove entire refuge"}), 400
 
@@ -1413,15 +2607,12 @@ def apply_overlay_changes(refuge_id: int):
                 logger.error(f"Error subtracting geometries in apply-overlays: {exc}")
                 return jsonify({"status": "error", "message": "Failed to subtract overlays"}), 500
 
-        result_geom = _make_valid_polygonal(result_geom)
+        # Every branch above leaves result_geom valid (the stored geometry, a
+        # _safe_unary_union result, one of its parts, or a repaired difference)
         if result_geom.is_empty or result_geom.geom_type not in ("Polygon", "MultiPolygon"):
             return jsonify({"status": "error", "message": "Resulting geometry is not a polygon"}), 400
 
-        result_geojson = shapely_mapping(result_geom)
-        target['polygon'] = {
-            "type": result_geojson.get("type"),
-            "coordinates": result_geojson.get("coordinates")
-        }
+        target = _set_refuge_geometry(dict(target), result_geom)
 
         refuges[target_idx] = target
 
@@ -1429,25 +2620,16 @@ def apply_overlay_changes(refuge_id: int):
             refuges, removed_refuge_ids = _subtract_overlay_from_other_refuges(
                 refuges,
                 target.get('id'),
-                adjoin_union_for_others
+                adjoin_union_for_others,
+                _refuge_index(cache)
             )
+            # The target itself is passed through unchanged, so it needs no re-insert
             if removed_refuge_ids:
                 logger.info(f"Removed refuges after cross-refuge subtraction: {removed_refuge_ids}")
 
-            target_idx = None
-            for idx, refuge in enumerate(refuges):
-                if isinstance(refuge, dict) and refuge.get('id') == target.get('id'):
-                    target_idx = idx
-                    break
-            if target_idx is None:
-                refuges.append(target)
-                target_idx = len(refuges) - 1
-
-            refuges[target_idx] = target
-
         _write_refuges(refuges)
 
-        return jsonify({"status": "success", "refuge": target})
+        return _refuge_response(target)
     except Exception as e:
         logger.error(f"Error applying overlay changes: {e}")
         return jsonify({"status": "error", "message": "Failed to apply overlay changes"}), 500
@@ -1459,3 +2641,42 @@ def not_found(error):
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({"status": "error", "message": "Internal server error"}), 500
+
+
+# -----------------------------
+# Startup
+# -----------------------------
+def _warm_caches():
+    """Load refuges and build their spatial index ahead of the first request."""
+    try:
+        cache = _refuges_snapshot()
+        _refuge_index(cache)
+        _refuge_names_lower(cache)
+    except Exception as e:
+        logger.error(f"Failed to warm refuge caches: {e}")
+
+
+# Importing the module touches no files; the data directory is prepared once per
+# process, on its first request or from gunicorn's when_ready hook (gunicorn.conf.py)
+_startup = {"done": False}
+_startup_lock = threading.Lock()
+
+
+def prepare_data():
+    """Create the data files if missing and warm the refuge caches, once per process."""
+    if _startup["done"]:
+        return
+    with _startup_lock:
+        if _startup["done"]:
+            return
+        try:
+            _ensure_data_file()
+        except Exception as e:
+            logger.error(f"Failed to initialize data directory {DATA_DIR}: {e}")
+        _warm_caches()
+        _startup["done"] = True
+
+
+@app.before_request
+def _prepare_data_once():
+    prepare_data()
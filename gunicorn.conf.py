@@ -0,0 +1,10 @@
+# Gunicorn reads this file from the working directory on startup.
+
+
+def when_ready(server):
+    # With --preload the app is already imported in the master, so build its
+    # caches there once and let the forked workers share them copy-on-write.
+    # Without it each worker prepares its own on its first request.
+    if server.cfg.preload_app:
+        import app
+        app.prepare_data()
@@ -0,0 +1,50 @@
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def sq(x0, y0, x1, y1):
+    """GeoJSON Polygon for the box (x0, y0)-(x1, y1)."""
+    return {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}
+
+
+def load_app(data_dir):
+    """Import app afresh against ``data_dir``, with compaction left to the tests."""
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['DATA_FSYNC'] = '0'
+    os.environ['REFUGES_COMPACT_INTERVAL'] = '3600'
+    os.environ['REFUGES_COMPACT_EVERY'] = '1000000'
+    import app
+    return importlib.reload(app)
+
+
+class AppTestCase(unittest.TestCase):
+    """Runs each test against a fresh app module and an empty data directory."""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, True)
+        self.app = load_app(self.data_dir)
+        self.client = self.app.app.test_client()
+
+    def create(self, name, polygon):
+        resp = self.client.post('/api/refuges', json={"name": name, "polygon": polygon})
+        self.assertEqual(resp.status_code, 201, resp.data)
+        return resp.get_json()['refuge']
+
+    def listed(self):
+        resp = self.client.get('/api/refuges')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return resp.get_json()['refuges']
+
+    def cold_listed(self):
+        """List the refuges as a process with no cache would see them."""
+        self.app._refuges_cache = {"key": None, "list": None, "response_bytes": None}
+        return self.listed()
@@ -0,0 +1,42 @@
+import unittest
+
+from shapely.geometry import shape
+
+from tests.support import AppTestCase, sq
+
+
+def noisy_box(x0, y0, x1, y1, n=50):
+    """Box ring starting at (x1, y0), with near-collinear vertices along its bottom edge."""
+    step = (x1 - x0) / n
+    bottom = [[x1 - i * step, y0 + (1e-8 if i % 2 else 0)] for i in range(n)]
+    ring = bottom + [[x0, y0], [x0, y1], [x1, y1], [x1, y0]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+class IncomingSimplifyTest(AppTestCase):
+
+    def test_off_by_default(self):
+        polygon = noisy_box(0, 0, 10, 10)
+        refuge = self.create("A", polygon)
+        self.assertEqual(self.app.SIMPLIFY_TOLERANCE_DEG, 0)
+        self.assertEqual(len(refuge['polygon']['coordinates'][0]), len(polygon['coordinates'][0]))
+
+    def test_simplified_polygon_stays_valid_and_keeps_its_first_vertex(self):
+        self.app.SIMPLIFY_TOLERANCE_DEG = 1e-6
+        polygon = noisy_box(0, 0, 10, 10)
+        geom = self.app._geom_from_geojson(polygon)
+        self.assertTrue(geom.is_valid)
+        self.assertLess(len(geom.exterior.coords), len(polygon['coordinates'][0]))
+        self.assertEqual(list(geom.exterior.coords[0]), polygon['coordinates'][0][0])
+
+    def test_carve_keeps_the_part_with_the_first_vertex_when_simplified(self):
+        self.app.SIMPLIFY_TOLERANCE_DEG = 1e-6
+        self.create("Strip", sq(4, -1, 6, 11))
+        refuge = self.create("A", noisy_box(0, 0, 10, 10))
+        kept = shape(refuge['polygon'])
+        self.assertTrue(kept.is_valid)
+        self.assertEqual(kept.bounds, (6.0, 0.0, 10.0, 10.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
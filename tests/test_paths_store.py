@@ -0,0 +1,67 @@
+import json
+import os
+import unittest
+
+from tests.support import AppTestCase
+
+
+class PathStoreTest(AppTestCase):
+
+    def write_paths_file(self, text):
+        with open(self.app.PATHS_FILE, 'w') as f:
+            f.write(text)
+        self.app._paths_cache = {"key": None, "list": None}
+
+    def stored_names(self):
+        with open(self.app.PATHS_FILE) as f:
+            return [p['name'] for p in json.load(f)['paths']]
+
+    def test_legacy_file_with_nan_keeps_its_paths_on_write(self):
+        legacy = {"paths": [{"id": 1, "name": "Old", "points": [{"lat": float('nan'), "lng": 1.0}]}]}
+        self.write_paths_file(json.dumps(legacy))
+        resp = self.client.post('/api/paths', json={"name": "New"})
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(resp.get_json()['path']['id'], 2)
+        self.assertEqual(self.stored_names(), ['Old', 'New'])
+
+    def test_unreadable_file_is_not_written_over(self):
+        self.write_paths_file('{"paths": [{"id": 1, "name": "Old"}]} garbage')
+        resp = self.client.post('/api/paths', json={"name": "New"})
+        self.assertEqual(resp.status_code, 500, resp.data)
+        with open(self.app.PATHS_FILE) as f:
+            self.assertTrue(f.read().endswith('garbage'))
+
+
+class DelayedPathWriteTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app.PATHS_WRITE_DELAY = 60
+        self.addCleanup(self.app._flush_paths)
+
+    def names(self):
+        return [p['name'] for p in self.client.get('/api/paths').get_json()['paths']]
+
+    def test_edits_are_visible_before_the_flush(self):
+        self.assertEqual(self.names(), [])
+        for name in ("A", "B"):
+            self.assertEqual(self.client.post('/api/paths', json={"name": name}).status_code, 201)
+        self.assertEqual(self.names(), ['A', 'B'])
+        self.app._flush_paths()
+        self.app._paths_cache = {"key": None, "list": None}
+        self.assertEqual(self.names(), ['A', 'B'])
+
+    def test_first_save_without_a_file_is_written_at_once(self):
+        self.assertEqual(self.names(), [])
+        os.remove(self.app.PATHS_FILE)
+        for name in ("A", "B"):
+            self.assertEqual(self.client.post('/api/paths', json={"name": name}).status_code, 201)
+        self.assertEqual(self.names(), ['A', 'B'])
+        self.assertTrue(os.path.exists(self.app.PATHS_FILE))
+        self.app._flush_paths()
+        self.app._paths_cache = {"key": None, "list": None}
+        self.assertEqual(self.names(), ['A', 'B'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+
+from shapely.geometry import shape
+
+from tests.support import AppTestCase, sq
+
+
+class BatchCreateTest(AppTestCase):
+
+    def post_batch(self, items):
+        return self.client.post('/api/refuges/batch', json={"refuges": items})
+
+    def test_partial_success_reports_errors(self):
+        self.create("Existing", sq(50, 0, 51, 1))
+        resp = self.post_batch([
+            {"name": "Q1", "polygon": sq(0, 0, 1, 1)},
+            {"name": "existing", "polygon": sq(2, 0, 3, 1)},
+            {"name": "Q2", "polygon": {"type": "Point", "coordinates": [0, 0]}},
+            {"name": "", "polygon": sq(4, 0, 5, 1)},
+            {"name": "Q3", "polygon": sq(6, 0, 7, 1)},
+        ])
+        self.assertEqual(resp.status_code, 201, resp.data)
+        body = resp.get_json()
+        self.assertEqual([r['name'] for r in body['refuges']], ['Q1', 'Q3'])
+        self.assertEqual([e['index'] for e in body['errors']], [1, 2, 3])
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['Existing', 'Q1', 'Q3'])
+
+    def test_duplicate_names_inside_a_batch(self):
+        resp = self.post_batch([
+            {"name": "Twin", "polygon": sq(0, 0, 1, 1)},
+            {"name": " twin ", "polygon": sq(2, 0, 3, 1)},
+        ])
+        self.assertEqual(resp.status_code, 201, resp.data)
+        body = resp.get_json()
+        self.assertEqual([r['name'] for r in body['refuges']], ['Twin'])
+        self.assertEqual(body['errors'], [{"index": 1, "message": "A refuge with this name already exists"}])
+
+    def test_items_are_carved_against_earlier_items(self):
+        self.create("Existing", sq(0, 0, 10, 10))
+        resp = self.post_batch([
+            {"name": "Q1", "polygon": sq(5, 0, 15, 10)},
+            {"name": "Q2", "polygon": sq(5, 0, 20, 10)},
+            {"name": "Q3", "polygon": sq(0, 0, 20, 10)},
+        ])
+        self.assertEqual(resp.status_code, 201, resp.data)
+        body = resp.get_json()
+        self.assertEqual([r['name'] for r in body['refuges']], ['Q1', 'Q2'])
+        q1, q2 = (shape(r['polygon']) for r in body['refuges'])
+        self.assertEqual(q1.bounds, (10.0, 0.0, 15.0, 10.0))
+        self.assertEqual(q2.bounds, (15.0, 0.0, 20.0, 10.0))
+        self.assertEqual(body['errors'][0]['index'], 2)
+        self.assertEqual([r['id'] for r in body['refuges']], [2, 3])
+
+    def test_nothing_created_is_a_400(self):
+        self.create("Taken", sq(0, 0, 1, 1))
+        resp = self.post_batch([
+            {"name": "taken", "polygon": sq(2, 0, 3, 1)},
+            {"name": "Bad", "polygon": "not a polygon"},
+        ])
+        self.assertEqual(resp.status_code, 400, resp.data)
+        self.assertEqual([e['index'] for e in resp.get_json()['errors']], [0, 1])
+        self.assertEqual(self.post_batch([]).status_code, 400)
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['Taken'])
+
+    def test_oversized_batch_is_rejected(self):
+        items = [{"name": f"R{i}", "polygon": sq(i, 0, i + 0.5, 1)}
+                 for i in range(self.app.MAX_BATCH_REFUGES + 1)]
+        resp = self.post_batch(items)
+        self.assertEqual(resp.status_code, 400, resp.data)
+        self.assertEqual(self.listed(), [])
+        resp = self.post_batch(items[:-1])
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(len(resp.get_json()['refuges']), self.app.MAX_BATCH_REFUGES)
+
+
+class RefugeJsonMemoTest(AppTestCase):
+
+    def test_memo_holds_only_current_records_between_list_responses(self):
+        for i in range(3):
+            self.create(f"R{i}", sq(i * 2, 0, i * 2 + 1, 1))
+        for n in range(20):
+            resp = self.client.put('/api/refuges/1', json={"name": f"A{n}"})
+            self.assertEqual(resp.status_code, 200, resp.data)
+            self.assertEqual(resp.get_json()['refuge']['name'], f"A{n}")
+        self.assertEqual(self.client.delete('/api/refuges/2').status_code, 200)
+        self.client.put('/api/refuges/3', json={"name": "C"})
+
+        parts = self.app._refuge_json_parts["parts"]
+        live = self.app._refuges_snapshot()["list"]
+        self.assertLessEqual(set(parts), {id(r) for r in live})
+        self.assertEqual([r['name'] for r in self.listed()], ['A19', 'C'])
+
+
+class ValidateOverlayTest(AppTestCase):
+
+    def validate(self, refuge_id, overlay):
+        return self.client.post(f'/api/refuges/{refuge_id}/validate-overlay',
+                                json={"operation": "subtract", "overlay": overlay})
+
+    def test_overlay_missing_a_single_part_refuge_is_accepted(self):
+        self.create("A", sq(0, 0, 4, 4))
+        resp = self.validate(1, sq(10, 10, 11, 11))
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertFalse(resp.get_json()['fragmenting'])
+
+    def test_overlay_missing_a_multi_part_refuge_reports_fragmentation(self):
+        # Only legacy data holds multi-part refuges; the create endpoint keeps one part
+        parts = [sq(0, 0, 1, 1)['coordinates'], sq(2, 0, 3, 1)['coordinates']]
+        self.app._write_refuges([{"id": 1, "name": "Legacy",
+                                  "polygon": {"type": "MultiPolygon", "coordinates": parts}}])
+        resp = self.validate(1, sq(10, 10, 11, 11))
+        self.assertEqual(resp.status_code, 400, resp.data)
+        self.assertEqual(resp.get_json()['code'], 'REFUGE_FRAGMENTATION')
+        resp = self.validate(1, sq(0.5, 0, 1, 1))
+        self.assertEqual(resp.get_json()['code'], 'REFUGE_FRAGMENTATION')
+
+
+if __name__ == '__main__':
+    unittest.main()
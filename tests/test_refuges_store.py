@@ -0,0 +1,218 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import unittest
+
+from tests.support import ROOT, AppTestCase, sq
+
+
+def _in_child(target):
+    """Run ``target`` in a forked process, as another gunicorn worker would."""
+    proc = multiprocessing.get_context('fork').Process(target=target)
+    proc.start()
+    proc.join(30)
+    return proc.exitcode
+
+
+class RefugeJournalTest(AppTestCase):
+
+    def read_journal(self):
+        with open(self.app.REFUGES_WAL, 'rb') as f:
+            return f.read()
+
+    def test_writes_are_appended_and_replayed(self):
+        a = self.create("A", sq(0, 0, 1, 1))
+        self.create("B", sq(2, 0, 3, 1))
+        self.assertEqual(self.client.put(f"/api/refuges/{a['id']}", json={"name": "A2"}).status_code, 200)
+        self.assertEqual(self.client.delete('/api/refuges/2').status_code, 200)
+
+        ops = [json.loads(line) for line in self.read_journal().splitlines()]
+        self.assertEqual([op['op'] for op in ops], ['put', 'put', 'put', 'del'])
+        live = self.listed()
+        self.assertEqual([r['name'] for r in live], ['A2'])
+        self.assertEqual(self.cold_listed(), live)
+
+    def test_another_worker_append_is_tailed(self):
+        self.create("A", sq(0, 0, 1, 1))
+        self.listed()
+
+        def other_worker():
+            self.app.app.test_client().post('/api/refuges', json={"name": "B", "polygon": sq(2, 0, 3, 1)})
+            os._exit(0)
+
+        self.assertEqual(_in_child(other_worker), 0)
+        tailed = []
+        original = self.app._tail_refuges_journal
+
+        def spy(cache):
+            result = original(cache)
+            tailed.append(result is not None)
+            return result
+
+        self.app._tail_refuges_journal = spy
+        live = self.listed()
+        self.assertEqual(tailed, [True])
+        self.assertEqual([r['name'] for r in live], ['A', 'B'])
+        self.assertEqual(self.cold_listed(), live)
+
+    def test_compaction_interleaved_with_appends(self):
+        def add(first):
+            client = self.app.app.test_client()
+            for i in range(first, first + 5):
+                resp = client.post('/api/refuges', json={"name": f"R{i}", "polygon": sq(i * 2, 0, i * 2 + 1, 1)})
+                self.assertEqual(resp.status_code, 201, resp.data)
+
+        stop = threading.Event()
+
+        def compact():
+            while not stop.is_set():
+                self.app._compact_refuges()
+
+        compactor = threading.Thread(target=compact)
+        writers = [threading.Thread(target=add, args=(n * 5,)) for n in range(4)]
+        compactor.start()
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        stop.set()
+        compactor.join()
+
+        live = self.listed()
+        self.assertEqual(sorted(r['name'] for r in live), sorted(f"R{i}" for i in range(20)))
+        self.assertEqual(len({r['id'] for r in live}), 20)
+        self.assertEqual(self.cold_listed(), live)
+        self.app._compact_refuges()
+        self.assertFalse(os.path.exists(self.app.REFUGES_WAL))
+        self.assertEqual(self.cold_listed(), live)
+
+    def test_torn_last_line_is_skipped_and_not_joined_to_the_next_append(self):
+        self.create("A", sq(0, 0, 1, 1))
+        with open(self.app.REFUGES_WAL, 'ab') as f:
+            f.write(b'{"op":"del","id":')
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['A'])
+
+        self.create("B", sq(2, 0, 3, 1))
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['A', 'B'])
+        self.app._compact_refuges()
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['A', 'B'])
+
+    def test_failed_append_is_reported(self):
+        self.create("A", sq(0, 0, 1, 1))
+        self.app._compact_refuges()
+        os.mkdir(self.app.REFUGES_WAL)
+        resp = self.client.post('/api/refuges', json={"name": "B", "polygon": sq(2, 0, 3, 1)})
+        self.assertEqual(resp.status_code, 500, resp.data)
+        os.rmdir(self.app.REFUGES_WAL)
+        self.assertEqual([r['name'] for r in self.listed()], ['A'])
+
+    def test_unreadable_store_is_not_written_over(self):
+        self.create("A", sq(0, 0, 1, 1))
+        self.app._compact_refuges()
+        with open(self.app.REFUGES_FILE, 'rb') as f:
+            stored = f.read()
+        with open(self.app.REFUGES_FILE, 'ab') as f:
+            f.write(b'garbage')
+        resp = self.client.post('/api/refuges', json={"name": "B", "polygon": sq(2, 0, 3, 1)})
+        self.assertEqual(resp.status_code, 500, resp.data)
+        self.assertFalse(os.path.exists(self.app.REFUGES_WAL))
+        with open(self.app.REFUGES_FILE, 'wb') as f:
+            f.write(stored)
+        self.assertEqual([r['name'] for r in self.listed()], ['A'])
+
+    def test_legacy_snapshot_with_nan_is_read_and_written(self):
+        legacy = {"refuges": [{"id": 1, "name": "A", "polygon": sq(0, 0, 1, 1), "elevation": float('nan')}]}
+        with open(self.app.REFUGES_FILE, 'w') as f:
+            json.dump(legacy, f)
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['A'])
+        self.create("B", sq(2, 0, 3, 1))
+        self.app._compact_refuges()
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['A', 'B'])
+
+    def test_restart_after_compaction_at_exit(self):
+        script = textwrap.dedent(f"""
+            import sys
+            sys.path.insert(0, {ROOT!r})
+            from tests.support import load_app, sq
+            app = load_app({self.data_dir!r})
+            client = app.app.test_client()
+            for i in range(3):
+                assert client.post('/api/refuges', json={{"name": f"R{{i}}", "polygon": sq(i * 2, 0, i * 2 + 1, 1)}}).status_code == 201
+            assert client.delete('/api/refuges/2').status_code == 200
+        """)
+        subprocess.run([sys.executable, '-c', script], check=True, capture_output=True)
+
+        self.assertFalse(os.path.exists(self.app.REFUGES_WAL))
+        with open(self.app.REFUGES_FILE, 'rb') as f:
+            stored = json.load(f)['refuges']
+        self.assertEqual([r['name'] for r in stored], ['R0', 'R2'])
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['R0', 'R2'])
+
+
+
+class RefugeJournalTailTest(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create("A", sq(0, 0, 1, 1))
+        self.assertEqual([r['name'] for r in self.listed()], ['A'])
+
+    def rewrite_journal(self, transform):
+        with open(self.app.REFUGES_WAL, 'rb') as f:
+            data = f.read()
+        return transform(data)
+
+    def test_compaction_and_append_by_another_worker(self):
+        def other_worker():
+            self.app._compact_refuges()
+            self.app.app.test_client().post('/api/refuges', json={"name": "B", "polygon": sq(2, 0, 3, 1)})
+            os._exit(0)
+
+        self.assertEqual(_in_child(other_worker), 0)
+        live = self.listed()
+        self.assertEqual([r['name'] for r in live], ['A', 'B'])
+        self.assertEqual(self.cold_listed(), live)
+
+    def test_compaction_between_snapshot_and_journal_reads(self):
+        self.create("B", sq(2, 0, 3, 1))
+        original = self.app._load_json_file
+        raced = []
+
+        def load_then_compact_elsewhere(f, size):
+            data = original(f, size)
+            if not raced:
+                raced.append(True)
+
+                def other_worker():
+                    self.app._compact_refuges()
+                    os._exit(0)
+
+                self.assertEqual(_in_child(other_worker), 0)
+            return data
+
+        self.app._load_json_file = load_then_compact_elsewhere
+        self.assertEqual([r['name'] for r in self.cold_listed()], ['A', 'B'])
+        self.assertEqual(raced, [True])
+
+    def test_journal_replaced_by_one_of_equal_size(self):
+        data = self.rewrite_journal(lambda d: d.replace(b'"name":"A"', b'"name":"Z"'))
+        tmp = self.app.REFUGES_WAL + '.new'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.app.REFUGES_WAL)
+        self.assertEqual(os.path.getsize(self.app.REFUGES_WAL), len(data))
+        self.assertEqual([r['name'] for r in self.listed()], ['Z'])
+
+    def test_journal_rewritten_in_place_with_other_ops(self):
+        data = self.rewrite_journal(lambda d: d.replace(b'"name":"A"', b'"name":"Zed"'))
+        with open(self.app.REFUGES_WAL, 'r+b') as f:
+            f.write(data)
+        self.assertEqual([r['name'] for r in self.listed()], ['Zed'])
+
+
+if __name__ == '__main__':
+    unittest.main()